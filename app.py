@@ -1,45 +1,307 @@
 import os
+import sys
+import json
+import shutil
+import hashlib
 import subprocess
 import re
 import time
+import socket
+import asyncio
 import uuid
 import threading
 import logging
-import io
-import zipfile
+import zlib
+import struct
 import tempfile
+import copy
+import heapq
+import queue
+import atexit
+import sqlite3
+import mmap
+import wave
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from isodate import parse_duration                    # ◀─ NEW: ISO8601 duration parser
 from http.cookiejar import MozillaCookieJar
 from flask import (
+    Blueprint,
     Flask,
+    Response,
     request,
     jsonify,
     render_template,
-    send_file,
     send_from_directory,
+    redirect,
     abort
 )
-from yt_dlp import YoutubeDL
-from yt_dlp.version import __version__ as ytdlp_version
-from yt_dlp.utils import DownloadError
-from urllib.parse import urlparse, parse_qs
-from playwright.sync_api import sync_playwright
-from googleapiclient.discovery import build            # ◀─ NEW: YouTube Data API client
+from urllib.parse import urlparse, parse_qs, quote
+# yt_dlp, playwright and googleapiclient are imported where first used: they
+# dominate import time and most requests never touch them
+
+# ───────────────────────────────────────────────────────────────────────────────
+# METRICS: bounded rate counters, stage histograms, per-host throughput
+# ───────────────────────────────────────────────────────────────────────────────
+
+class RateCounter:
+    """
+    Fixed ring of one-second buckets covering the last `span` seconds.
+    add() is O(1) and memory never grows; sum_since() touches at most
+    `span` buckets no matter how long the process has been running.
+    """
+
+    def __init__(self, span: int = 300):
+        self.span   = span
+        self.total  = 0                      # lifetime sum, for Prometheus counters
+        self._secs  = [0] * span             # which second each bucket currently holds
+        self._vals  = [0] * span
+        self._lock  = threading.Lock()
+
+    def add(self, amount=1, ts: float = None):
+        sec = int(time.time() if ts is None else ts)
+        i = sec % self.span
+        with self._lock:
+            self.total += amount
+            if self._secs[i] > sec:
+                return                       # older than the window: lifetime total only
+            if self._secs[i] != sec:
+                self._secs[i], self._vals[i] = sec, 0
+            self._vals[i] += amount
+
+    def sum_since(self, window: int) -> float:
+        """Sum over the last `window` seconds (window <= span)."""
+        now = int(time.time())
+        oldest = now - min(window, self.span) + 1
+        with self._lock:
+            return sum(v for sec, v in zip(self._secs, self._vals) if oldest <= sec <= now)
+
+class Histogram:
+    """Cumulative-bucket latency histogram in the Prometheus style."""
+
+    BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts  = [0] * (len(self.buckets) + 1)   # last slot = +Inf
+        self.sum     = 0.0
+        self.count   = 0
+        self._lock   = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            for i, le in enumerate(self.buckets):
+                if value <= le:
+                    self.counts[i] += 1
+                    break
+            else:
+                self.counts[-1] += 1
+            self.sum   += value
+            self.count += 1
+
+    def snapshot(self):
+        """([(le, cumulative_count)], sum, count) including the +Inf bucket."""
+        with self._lock:
+            out, running = [], 0
+            for le, c in zip(self.buckets + (float("inf"),), self.counts):
+                running += c
+                out.append((le, running))
+            return out, self.sum, self.count
+
+# Pipeline stages timed per job
+PIPELINE_STAGES = ("cookie_refresh", "metadata", "player_api", "download",
+                   "stream", "transcode", "silence", "split", "zip")
+STAGE_SECONDS   = {stage: Histogram() for stage in PIPELINE_STAGES}
+
+def timed_iter(iterable, stage: str, t0: float = None):
+    """Passes `iterable` through and records the stage once it is exhausted."""
+    t0 = time.perf_counter() if t0 is None else t0
+    try:
+        yield from iterable
+    finally:
+        STAGE_SECONDS[stage].observe(time.perf_counter() - t0)
+
+class stage_timer:
+    """Context manager: `with stage_timer("download"): ...` records its duration."""
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        STAGE_SECONDS[self.stage].observe(time.perf_counter() - self.t0)
+        return False
+
+# Upstream hosts we talk to, grouped the way we want to see them
+UPSTREAM_HOSTS  = ("data_api", "innertube", "googlevideo", "other")
+UPSTREAM_CALLS  = {host: RateCounter() for host in UPSTREAM_HOSTS}
+UPSTREAM_BYTES  = {host: RateCounter() for host in UPSTREAM_HOSTS}
+
+def upstream_host(url: str) -> str:
+    host = urlparse(url).hostname or ""
+    if host.endswith("googlevideo.com"):
+        return "googlevideo"
+    if host.endswith("googleapis.com"):
+        return "data_api"
+    if "/youtubei/" in url:
+        return "innertube"
+    return "other"
+
+def record_transfer(url_or_host: str, nbytes: int):
+    """Counts response bytes received from an upstream host."""
+    host = url_or_host if url_or_host in UPSTREAM_BYTES else upstream_host(url_or_host)
+    UPSTREAM_BYTES[host].add(nbytes)
+
+# ─── Outbound request governor: AIMD token bucket per upstream host ────
+class TokenBucket:
+    """
+    Paces calls to one upstream host at `rate` per second (bursts up to one
+    second's worth). A 429/403 halves the rate, at most once per `cooldown`
+    since in-flight requests all report the same throttling, and remembers
+    the rate that was refused. Every healthy second after that adds `step`
+    back, a tenth of it once within 90% of the refused rate, up to
+    `max_rate`. The rate therefore settles just under the point where the
+    host starts refusing us and only slowly probes past it.
+    """
+
+    def __init__(self, max_rate: float, min_rate: float, backoff: float, step: float, cooldown: float):
+        self.max_rate = max_rate
+        self.min_rate = min(min_rate, max_rate)
+        self.backoff  = backoff
+        self.step     = step
+        self.cooldown = cooldown
+        self.rate     = max_rate
+        self.tokens   = max_rate
+        self.refused_at = None         # rate at the last cut; None = never throttled
+        self.throttled    = 0          # 429/403 responses seen
+        self.backoffs     = 0          # times the rate was cut
+        self.waits        = 0          # acquire() calls that had to sleep
+        self.wait_seconds = 0.0
+        self._paused_until = 0.0       # Retry-After
+        self._last_fill    = time.monotonic()
+        self._last_cut     = 0.0
+        self._last_raise   = 0.0
+        self._healthy      = True
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Takes a token, sleeping until it is due. Waiters queue up as negative tokens."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(max(self.rate, 1.0), self.tokens + (now - self._last_fill) * self.rate)
+            self._last_fill = now
+            self.tokens -= 1
+            wait = max(-self.tokens / self.rate, self._paused_until - now)
+            if wait > 0:
+                self.waits += 1
+                self.wait_seconds += wait
+        if wait > 0:
+            time.sleep(wait)
+
+    def record(self, status: int, retry_after: float = None):
+        with self._lock:
+            now = time.monotonic()
+            if status in (429, 403):
+                self.throttled += 1
+                if retry_after:
+                    self._paused_until = max(self._paused_until, now + retry_after)
+                if now - self._last_cut >= self.cooldown:
+                    if self._healthy:          # later cuts of one episode don't lower the mark
+                        self.refused_at = self.rate
+                    self._healthy = False
+                    self.rate = max(self.min_rate, self.rate * self.backoff)
+                    self.tokens = min(self.tokens, 0.0)
+                    self._last_cut = now
+                    self.backoffs += 1
+            elif status < 400 and now - self._last_cut >= self.cooldown:
+                self._healthy = True           # (answers to requests sent before the cut don't count)
+                if self.rate < self.max_rate and now - self._last_raise >= 1.0:
+                    near = self.refused_at is not None and self.rate >= 0.9 * self.refused_at
+                    self.rate = min(self.max_rate, self.rate + (self.step / 10 if near else self.step))
+                    self._last_raise = now
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "rate":         round(self.rate, 3),
+                "max_rate":     self.max_rate,
+                "refused_at":   round(self.refused_at, 3) if self.refused_at is not None else None,
+                "tokens":       round(self.tokens, 2),
+                "throttled":    self.throttled,
+                "backoffs":     self.backoffs,
+                "waits":        self.waits,
+                "wait_seconds": round(self.wait_seconds, 3),
+                "paused_for":   round(max(0.0, self._paused_until - time.monotonic()), 3),
+            }
+
+class RequestGovernor:
+    """One TokenBucket per UPSTREAM_HOSTS entry; a no-op when disabled."""
+
+    def __init__(self, max_rates: dict, enabled: bool = True, min_rate: float = 0.2,
+                 backoff: float = 0.5, step: float = 0.05, cooldown: float = 2.0):
+        self.enabled = enabled
+        self.buckets = {
+            host: TokenBucket(rate, min_rate, backoff, step * rate, cooldown)
+            for host, rate in max_rates.items()
+        }
+
+    def acquire(self, host: str):
+        if self.enabled:
+            self.buckets[host].acquire()
+
+    def record(self, host: str, status: int, retry_after=None):
+        if self.enabled:
+            self.buckets[host].record(status, parse_retry_after(retry_after))
+
+    def health(self, host: str) -> float:
+        """Current rate as a fraction of the ceiling (1.0 = never throttled)."""
+        bucket = self.buckets[host]
+        return bucket.rate / bucket.max_rate if self.enabled else 1.0
+
+    def ytdlp_pacing(self) -> dict:
+        """yt-dlp's own pacing options, scaled to how the hosts are treating us now."""
+        return {
+            'ratelimit':               max(1, int(YTDLP_RATELIMIT * self.health("googlevideo"))),
+            'sleep_interval_requests': round(1 / self.buckets["innertube"].rate, 3) if self.enabled else 0,
+        }
+
+    def stats(self) -> dict:
+        return {"enabled": self.enabled, **{host: b.stats() for host, b in self.buckets.items()}}
+
+def parse_retry_after(value) -> float:
+    """Seconds from a Retry-After header; the HTTP-date form is ignored."""
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except (TypeError, ValueError):
+        return None
 
 # ─── Instrument HTTP requests for “too many” detection ─────────────────
-REQUEST_TIMESTAMPS = []
-_request_lock = threading.Lock()
+REQUEST_RATE  = RateCounter(300)
 _orig_request = requests.Session.request
 
 def instrumented_request(self, method, url, **kwargs):
-    ts = time.time()
+    host = upstream_host(url)
+    GOVERNOR.acquire(host)
+    ts   = time.time()
+    resp = None
     try:
-        return _orig_request(self, method, url, **kwargs)
+        resp = _orig_request(self, method, url, **kwargs)
+        if not kwargs.get('stream'):
+            record_transfer(url, len(resp.content))   # streamed bodies are counted by their readers
+        return resp
     finally:
-        with _request_lock:
-            REQUEST_TIMESTAMPS.append(ts)
+        REQUEST_RATE.add(1, ts)
+        UPSTREAM_CALLS[host].add(1, ts)
+        if resp is not None:
+            GOVERNOR.record(host, resp.status_code, resp.headers.get("Retry-After"))
 
 requests.Session.request = instrumented_request
 # End instrumentation
@@ -51,11 +313,11 @@ requests.Session.request = instrumented_request
 # Maximum video length (in seconds) allowed by this service
 MAX_VIDEO_LENGTH_SECS = 90 * 60  # 1 hour 30 minutes
 
-# ◀─ NEW: Load & initialize Data API
+# ◀─ NEW: Data API key; a missing key only fails Data API calls (and /ready)
 YOUTUBE_API_KEY = os.environ.get("YOUTUBE_API_KEY")
-if not YOUTUBE_API_KEY:
-    raise RuntimeError("Missing YOUTUBE_API_KEY environment variable")
-YOUTUBE_SERVICE = build("youtube", "v3", developerKey=YOUTUBE_API_KEY)
+# Endpoint overrides point the service at local stand-ins (benchmarks/e2e.py)
+YOUTUBE_API_ENDPOINT = os.environ.get("YOUTUBE_API_ENDPOINT")
+YOUTUBE_PLAYER_URL   = os.environ.get("YOUTUBE_PLAYER_URL", "https://www.youtube.com/youtubei/v1/player")
 
 # Your standard browser UA & headers
 COMMON_HEADERS = {
@@ -68,29 +330,344 @@ COMMON_HEADERS = {
     "Referer": "https://www.youtube.com"
 }
 
+# Output formats selectable on /start. Only "mp3" re-encodes; the others keep
+# the codec YouTube already serves and are cut with stream copy.
+OUTPUT_FORMATS = {
+    "mp3":  {"ext": "mp3",  "codec": "mp3",  "mime": None},
+    "m4a":  {"ext": "m4a",  "codec": "aac",  "mime": "audio/mp4"},
+    "opus": {"ext": "opus", "codec": "opus", "mime": "audio/webm"},
+}
+DEFAULT_OUTPUT_FORMAT = "mp3"
+MP3_BITRATE           = "192k"
+
+# Container extension for each Innertube audio mime type
+SOURCE_EXTS = {"audio/mp4": "m4a", "audio/webm": "webm"}
+
+# "file":   download the whole source, then encode & split it (default)
+# "stream": pipe the download into ffmpeg so encoding/splitting overlap the network
+PIPELINE_MODE = os.environ.get("PIPELINE_MODE", "file")
+
+# MP3 results keep one source file plus a frame index and serve each chapter
+# as a byte slice of it, instead of writing a file per chapter
+CHAPTER_SLICES  = os.environ.get("CHAPTER_SLICES", "1") != "0"
+MP3_SOURCE_NAME = ".source.mp3"
+
+# MP3 encoding: "single" encodes the whole track with one libmp3lame run,
+# then cuts (or slices) it; "parallel" decodes the source once to PCM and
+# encodes every chapter as its own ffmpeg process, up to CPU_SLOTS at once
+# across all jobs. Parallel results are a file per chapter (no byte slices).
+MP3_ENCODE = os.environ.get("MP3_ENCODE", "single")
+
+# Videos with no chapters anywhere are cut at silences instead: a gap is at
+# least SILENCE_MIN_SECS below SILENCE_THRESHOLD_DB (dBFS), and no chapter is
+# shorter than AUTO_CHAPTER_MIN_SECS
+AUTO_CHAPTERS         = os.environ.get("AUTO_CHAPTERS", "1") != "0"
+SILENCE_THRESHOLD_DB  = float(os.environ.get("SILENCE_THRESHOLD_DB", -40))
+SILENCE_MIN_SECS      = float(os.environ.get("SILENCE_MIN_SECS", 2.0))
+AUTO_CHAPTER_MIN_SECS = float(os.environ.get("AUTO_CHAPTER_MIN_SECS", 30))
+
+# Ranged downloader: parallel byte ranges per source file, each retried on its own
+DOWNLOAD_WORKERS     = int(os.environ.get("DOWNLOAD_WORKERS", 4))
+DOWNLOAD_RANGE_BYTES = 8 * 1024 * 1024   # 8 MiB per range request
+DOWNLOAD_RETRIES     = 5                 # attempts per range before the job fails
+
+# Finished results live in downloads/<cache key>/ and are reused by later jobs
+DOWNLOADS_DIR       = os.path.abspath(os.environ.get("DOWNLOADS_DIR", "downloads"))
+RESULT_MANIFEST     = ".result.json"
+RESULT_CACHE_MAX_MB = float(os.environ.get("RESULT_CACHE_MAX_MB", 5 * 1024))
+RESULT_READ_GRACE   = 10 * 60     # results read this recently are never evicted (downloads in flight)
+
+# Metadata / chapter lookups are shared across requests for this long
+METADATA_TTL     = int(os.environ.get("METADATA_TTL", 15 * 60))
+METADATA_MAX_IDS = 1024
+DATA_API_BATCH   = 50                          # videos.list / playlistItems.list page size limit
+
+# gunicorn worker processes on this box (gunicorn reads WEB_CONCURRENCY as its
+# --workers default). Each worker has its own scheduler, stage slots, governor
+# and Chromium, so the default limits below are the box's budget split between
+# them; a limit set explicitly in the environment is per worker.
+WEB_WORKERS = max(1, int(os.environ.get("WEB_CONCURRENCY", 1)))
+
+def per_worker(total: int) -> int:
+    """This worker's share of a box-wide limit (at least 1)."""
+    return max(1, total // WEB_WORKERS)
+
+# Job scheduler: how many jobs run at once, how many may wait, and separate
+# slot limits for the network-bound and CPU-bound (ffmpeg) stages
+MAX_WORKERS = int(os.environ.get("MAX_WORKERS", per_worker(4)))
+MAX_QUEUE   = int(os.environ.get("MAX_QUEUE", 32))
+NET_SLOTS   = int(os.environ.get("NET_SLOTS", per_worker(4)))
+BATCH_MAX_VIDEOS = int(os.environ.get("BATCH_MAX_VIDEOS", MAX_QUEUE))   # per /batch; a batch is queued all-or-nothing
+BATCH_PRIORITY   = 1                          # single /start jobs run ahead of batch jobs
+CPU_SLOTS   = int(os.environ.get("CPU_SLOTS", per_worker(os.cpu_count() or 2)))
+
+# Outbound request governor (see TokenBucket): request-per-second ceilings per
+# upstream host, e.g. GOVERNOR_MAX_RPS="googlevideo=200,innertube=5".
+# Every call through requests (ours and yt-dlp's) and every Data API call
+# waits for its host's bucket. The default ceilings are split between the
+# WEB_WORKERS; GOVERNOR_MAX_RPS values are per worker.
+GOVERNOR_ENABLED = os.environ.get("GOVERNOR", "1") != "0"
+GOVERNOR_MAX_RPS = {host: rate / WEB_WORKERS for host, rate in
+                    {"data_api": 20.0, "innertube": 10.0, "googlevideo": 100.0, "other": 20.0}.items()}
+GOVERNOR_MAX_RPS.update(
+    (host.strip(), float(rate))
+    for host, _, rate in (item.partition("=") for item in os.environ.get("GOVERNOR_MAX_RPS", "").split(","))
+    if host.strip() in GOVERNOR_MAX_RPS and rate
+)
+YTDLP_RATELIMIT = 1_000_000      # bytes/s for the yt-dlp fallback at full health
+
+GOVERNOR = RequestGovernor(GOVERNOR_MAX_RPS, enabled=GOVERNOR_ENABLED)
+
+# Shared HTTP transport: every job's session rides one set of keep-alive
+# pools, at most HTTP_POOL_MAXSIZE connections per host (further requests
+# wait for a free one). Idempotent calls and the player POST are retried
+# HTTP_RETRIES times with exponential backoff on connect errors and 5xx.
+HTTP_POOL_HOSTS      = int(os.environ.get("HTTP_POOL_HOSTS", 32))     # googlevideo spreads media over many hosts
+HTTP_POOL_MAXSIZE    = int(os.environ.get("HTTP_POOL_MAXSIZE", MAX_WORKERS * DOWNLOAD_WORKERS))
+HTTP_RETRIES         = int(os.environ.get("HTTP_RETRIES", 3))
+HTTP_BACKOFF         = float(os.environ.get("HTTP_BACKOFF", 0.5))
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", 5))
+HTTP_READ_TIMEOUT    = float(os.environ.get("HTTP_READ_TIMEOUT", 30))  # per socket read, not per body
+
+# Task state: "sqlite" (shared by every worker/container on the same volume)
+# or "memory" (single process). Tasks expire TASK_TTL seconds after their
+# last update.
+TASK_STORE = os.environ.get("TASK_STORE", "sqlite")
+TASK_DB    = os.environ.get("TASK_DB", os.path.join(DOWNLOADS_DIR, ".tasks.sqlite3"))
+TASK_TTL   = int(os.environ.get("TASK_TTL", 24 * 3600))
+PROGRESS_WRITE_INTERVAL = 0.25   # coalesce percent-only updates closer together than this
+# A job's claim on its video/format names the process that runs it and lapses
+# JOB_CLAIM_TTL seconds after that process's last heartbeat (every
+# JOB_HEARTBEAT_SECS). Claims of dead or silent workers are free again, and
+# their unfinished tasks are marked as errors.
+JOB_CLAIM_TTL      = int(os.environ.get("JOB_CLAIM_TTL", 60))
+JOB_HEARTBEAT_SECS = JOB_CLAIM_TTL / 4
+ORPHANED_JOB_ERROR = "The worker running this job stopped. Please try again."
+
+# Jobs build their output in a private scratch dir, then publish it into
+# DOWNLOADS_DIR with one rename. SCRATCH_DIR may be a tmpfs; if it is on
+# another filesystem the output is copied next to DOWNLOADS_DIR first.
+SCRATCH_DIR     = os.path.abspath(os.environ.get("SCRATCH_DIR", os.path.join(DOWNLOADS_DIR, ".scratch")))
+SCRATCH_MAX_AGE = 6 * 3600       # leftovers from crashed workers are removed after this
+
+# Server-Sent Events progress streams
+SSE_HEARTBEAT_SECS  = 15      # comment line to keep proxies from timing the stream out
+SSE_MAX_STREAM_SECS = 120     # then the browser reconnects with Last-Event-ID
+SSE_RETRY_MS        = 1000
+SSE_POLL_SECS       = 0.5     # how often listeners check the store for other workers' updates
+# /events streams are served by a separate asyncio process ("python app.py
+# events", see serve_events) listening on EVENTS_PORT, so idle listeners hold
+# a coroutine rather than a web worker thread. EVENTS_URL overrides the base
+# URL browsers use to reach it (e.g. behind a reverse proxy). With neither
+# set, the web workers serve /events themselves (development only).
+EVENTS_PORT = int(os.environ.get("EVENTS_PORT", 0))
+EVENTS_URL  = os.environ.get("EVENTS_URL", "").rstrip("/")
+
+# yt-dlp extractor args (shared by metadata lookups and the fallback download)
+YTDLP_EXTRACTOR_ARGS = [
+    'player_skip=webpage,configs',
+    'player_client=tv'
+]
+
+# ───────────────────────────────────────────────────────────────────────────────
+# HELPERS: TTL/LRU cache with single-flight loads
+# ───────────────────────────────────────────────────────────────────────────────
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries expire after `ttl` seconds.
+    get_or_load() collapses concurrent misses for one key into a single
+    loader call; the other callers wait for (and share) its result.
+    Failed loads are not cached.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize  = maxsize
+        self.ttl      = ttl
+        self.hits     = 0
+        self.misses   = 0
+        self._data    = OrderedDict()        # key → (expires_at, value)
+        self._loading = {}                   # key → Event set when the load ends
+        self._lock    = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            return self._get_locked(key)
+
+    def _get_locked(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_load(self, key, loader):
+        while True:
+            with self._lock:
+                value = self._get_locked(key)
+                if value is not None:
+                    self.hits += 1
+                    return value
+                waiter = self._loading.get(key)
+                if waiter is None:
+                    self.misses += 1
+                    waiter = self._loading[key] = threading.Event()
+                    break
+            # someone else is loading this key: wait, then re-check the cache
+            # (if their load failed, the next pass makes us the loader)
+            waiter.wait()
+
+        try:
+            value = loader()
+            self.set(key, value)
+            return value
+        finally:
+            with self._lock:
+                self._loading.pop(key, None)
+            waiter.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._data), "hits": self.hits, "misses": self.misses}
+
+METADATA_CACHE   = TTLCache(METADATA_MAX_IDS, METADATA_TTL)   # Data API videos.list
+YTDLP_INFO_CACHE = TTLCache(METADATA_MAX_IDS, METADATA_TTL)   # yt-dlp extract_info
+VIDEO_CACHE      = TTLCache(METADATA_MAX_IDS, METADATA_TTL)   # resolved title/chapters/duration
+
 # ───────────────────────────────────────────────────────────────────────────────
 # HELPERS: Metadata & Chapters via Data API
 # ───────────────────────────────────────────────────────────────────────────────
 
 def get_video_metadata(video_id):
+    """
+    Title, description and duration via YouTube Data API, cached per video ID.
+    """
+    return METADATA_CACHE.get_or_load(video_id, lambda: fetch_video_metadata(video_id))
+
+def fetch_video_metadata(video_id):
     """
     Fetches title, description, duration, thumbnail via YouTube Data API.
     """
-    resp = (
-        YOUTUBE_SERVICE.videos()
-        .list(part="snippet,contentDetails", id=video_id)
-        .execute()
-    )
-    items = resp.get("items", [])
-    if not items:
+    found = fetch_videos_metadata([video_id])
+    if video_id not in found:
         raise ValueError(f"No video found for ID {video_id}")
-    sn = items[0]["snippet"]
-    cd = items[0]["contentDetails"]
-    return {
-        "title":       sn["title"],
-        "description": sn.get("description", ""),
-        "duration":    cd["duration"],            # ISO8601 string, e.g. "PT5M30S"
-    }
+    return found[video_id]
+
+YOUTUBE_SERVICE = None                  # built on first use; assign a stub to test offline
+_service_lock   = threading.Lock()
+_data_api_local = threading.local()
+
+def youtube_service():
+    """
+    The Data API client, built once on first use from the discovery document
+    bundled with googleapiclient (no network round trip).
+    """
+    global YOUTUBE_SERVICE
+    if YOUTUBE_SERVICE is None:
+        with _service_lock:
+            if YOUTUBE_SERVICE is None:
+                if not YOUTUBE_API_KEY:
+                    raise RuntimeError("Missing YOUTUBE_API_KEY environment variable")
+                from googleapiclient.discovery import build
+                YOUTUBE_SERVICE = build(
+                    "youtube", "v3", developerKey=YOUTUBE_API_KEY,
+                    static_discovery=True, cache_discovery=False,
+                    client_options={"api_endpoint": YOUTUBE_API_ENDPOINT} if YOUTUBE_API_ENDPOINT else None,
+                )
+    return YOUTUBE_SERVICE
+
+def data_api_call(req) -> dict:
+    """Executes a Data API request, counting it for /metrics."""
+    # httplib2.Http isn't thread-safe: concurrent /start requests sharing the
+    # service's connection get each other's responses, so each thread has its own
+    http = getattr(_data_api_local, "http", None)
+    if http is None:
+        from googleapiclient.http import build_http
+        http = _data_api_local.http = build_http()
+    from googleapiclient.errors import HttpError
+    # googleapiclient uses httplib2, not requests: count and pace the call by hand
+    GOVERNOR.acquire("data_api")
+    UPSTREAM_CALLS["data_api"].add(1)
+    try:
+        resp = req.execute(http=http)
+    except HttpError as e:
+        GOVERNOR.record("data_api", e.resp.status, e.resp.get("retry-after"))
+        raise
+    GOVERNOR.record("data_api", 200)
+    record_transfer("data_api", len(json.dumps(resp)))
+    return resp
+
+def fetch_videos_metadata(video_ids) -> dict:
+    """
+    Looks up many videos with one videos.list call per DATA_API_BATCH IDs.
+    Returns {video_id: metadata}; IDs the API doesn't know are left out.
+    """
+    found = {}
+    for i in range(0, len(video_ids), DATA_API_BATCH):
+        chunk = video_ids[i:i + DATA_API_BATCH]
+        resp = data_api_call(
+            youtube_service().videos().list(
+                part="snippet,contentDetails", id=",".join(chunk), maxResults=len(chunk))
+        )
+        for item in resp.get("items", []):
+            sn = item["snippet"]
+            cd = item["contentDetails"]
+            found[item["id"]] = {
+                "title":       sn["title"],
+                "description": sn.get("description", ""),
+                "duration":    cd["duration"],        # ISO8601 string, e.g. "PT5M30S"
+            }
+    return found
+
+def get_videos_metadata(video_ids) -> dict:
+    """
+    Batched get_video_metadata: cached IDs are served from METADATA_CACHE,
+    the rest are fetched together and cached.
+    """
+    found, missing = {}, []
+    for vid in video_ids:
+        meta = METADATA_CACHE.get(vid)
+        if meta is None:
+            missing.append(vid)
+        else:
+            found[vid] = meta
+    if missing:
+        fetched = fetch_videos_metadata(missing)
+        for vid, meta in fetched.items():
+            METADATA_CACHE.set(vid, meta)
+        found.update(fetched)
+    return found
+
+def fetch_playlist_video_ids(playlist_id: str, limit: int = BATCH_MAX_VIDEOS):
+    """
+    Unique video IDs of a playlist in order, following playlistItems pages
+    until there are more than `limit` of them (so the caller can tell the
+    playlist is too big without reading all of it). Returns (ids, total),
+    total being the playlist's size as the API reports it.
+    """
+    ids, page, total = {}, None, 0
+    while len(ids) <= limit:
+        resp = data_api_call(
+            youtube_service().playlistItems().list(
+                part="contentDetails", playlistId=playlist_id,
+                maxResults=DATA_API_BATCH, pageToken=page)
+        )
+        total = resp.get("pageInfo", {}).get("totalResults", total)
+        ids.update(dict.fromkeys(it["contentDetails"]["videoId"] for it in resp.get("items", [])))
+        page = resp.get("nextPageToken")
+        if not page:
+            break
+    return list(ids), max(total, len(ids))
 
 def parse_chapters(description_text):
     """
@@ -108,28 +685,275 @@ def parse_chapters(description_text):
         chapters.append({"start_time": secs, "title": m.group("label")})
     return chapters
 
+def ytdlp_info_opts():
+    """yt-dlp options for metadata-only lookups (cookies only if we have a jar)."""
+    opts = {
+        'quiet':             True,
+        'geo_bypass':        True,
+        'nocheckcertificate':True,
+        'http_headers':      COMMON_HEADERS,
+        'downloader':        'curl_cffi',
+        'extractor_args':    {'youtube': YTDLP_EXTRACTOR_ARGS},
+        **GOVERNOR.ytdlp_pacing(),
+    }
+    if os.path.exists(COOKIE_FILE):
+        opts['cookiefile'] = COOKIE_FILE
+    return opts
+
+def get_ytdlp_info(youtube_url: str):
+    """
+    Title, duration and chapters via one yt-dlp extract_info, cached per video.
+    """
+    def load():
+        from yt_dlp import YoutubeDL
+        with YoutubeDL(ytdlp_info_opts()) as ydl:
+            info = ydl.extract_info(youtube_url, download=False)
+        return {
+            "title":    info.get("title", youtube_url),
+            "duration": info.get("duration") or 0,
+            "chapters": info.get("chapters") or [],
+        }
+    return YTDLP_INFO_CACHE.get_or_load(extract_video_id(youtube_url) or youtube_url, load)
+
+def resolve_video(video_id: str, youtube_url: str, meta=None):
+    """
+    Title, chapters (with end_time) and duration for one video: Data API
+    first, then at most ONE yt-dlp lookup if the API failed or the
+    description had no timestamps. Pass `meta` when the caller already has
+    the Data API result. The resolution is cached; callers get a deep copy.
+    """
+    def load():
+        m = meta
+        if m is None:
+            try:
+                m = get_video_metadata(video_id)
+            except Exception as e:
+                app.logger.warning(f"Data API failed ({e}); falling back to yt-dlp for metadata")
+
+        chapters = []
+        if m is not None:
+            title         = m["title"]
+            chapters      = parse_chapters(m["description"])
+            duration_secs = int(parse_duration(m['duration']).total_seconds())
+
+        if not chapters:
+            try:
+                if m is not None:
+                    app.logger.info("No description-chapters; falling back to yt-dlp for chapters")
+                info = get_ytdlp_info(youtube_url)
+            except Exception as e:
+                if m is None:
+                    raise
+                app.logger.warning(f"Chapter extraction via yt-dlp failed ({e}); proceeding without chapters")
+                info = {}
+            if m is None:
+                title         = info["title"]
+                duration_secs = int(info["duration"])
+            chapters = [
+                {"start_time": ch["start_time"], "title": ch["title"]}
+                for ch in info.get("chapters") or []
+            ]
+
+        return {
+            "title":         title,
+            "chapters":      add_end_times(chapters, duration_secs),
+            "duration_secs": duration_secs,
+        }
+    return copy.deepcopy(VIDEO_CACHE.get_or_load(video_id, load))
+
+def add_end_times(chapters, duration_secs):
+    """
+    Sets each chapter's end_time to the next chapter's start (the last one
+    ends at duration_secs). Returns the same list.
+    """
+    for idx, ch in enumerate(chapters):
+        if idx < len(chapters) - 1:
+            ch['end_time'] = chapters[idx+1]['start_time']
+        else:
+            ch['end_time'] = duration_secs
+    return chapters
+
 # ───────────────────────────────────────────────────────────────────────────────
-# HELPERS: Headless Chromium cookie refresh (unchanged)
+# HELPERS: Headless Chromium cookie service (warm browser, single-flight refresh)
 # ───────────────────────────────────────────────────────────────────────────────
 
-COOKIE_FILE = os.path.join(tempfile.gettempdir(), "youtube_cookies.txt")
-COOKIE_TTL  = 5 * 60  # 5 minutes
+COOKIE_FILE           = os.path.join(tempfile.gettempdir(), "youtube_cookies.txt")
+COOKIE_TTL            = 5 * 60   # 5 minutes
+COOKIE_REFRESH_MARGIN = 60       # background refresh this long before expiry
+COOKIE_KEEPWARM_SECS  = 30 * 60  # stop background refreshes after this long unused
+COOKIE_REFRESH_WAIT   = 120      # a caller gives up on a refresh after this (launch + two page loads)
+COOKIE_REFRESH        = os.environ.get("COOKIE_REFRESH", "1") != "0"   # 0 = never launch a browser
 
-def maybe_refresh_cookies(video_url: str):
+class CookieService:
     """
-    Refresh only if cookie-jar is missing or older than COOKIE_TTL.
+    Owns one long-lived headless Chromium + context on a dedicated thread
+    (Playwright's sync API only works from the thread that started it).
+    The current cookies are kept in memory and handed out as fresh jars;
+    COOKIE_FILE is only rewritten via an atomic rename, for yt-dlp.
+
+    Refreshes are single-flight: concurrent callers with a stale jar wait for
+    one refresh. While jobs keep asking for cookies, the browser thread
+    refreshes on its own COOKIE_REFRESH_MARGIN seconds before expiry.
     """
-    if os.path.exists(COOKIE_FILE) and (time.time() - os.path.getmtime(COOKIE_FILE) < COOKIE_TTL):
-        app.logger.info("▶ Reusing existing cookies (TTL not expired)")
-    else:
-        refresh_cookies(video_url)
-        app.logger.info("▶ Refreshing cookies")
-
-def refresh_cookies(video_url: str):
-    if os.path.exists(COOKIE_FILE):
-        os.remove(COOKIE_FILE)
 
-    with sync_playwright() as p:
+    def __init__(self, cookie_file: str = COOKIE_FILE, ttl: float = COOKIE_TTL,
+                 margin: float = COOKIE_REFRESH_MARGIN):
+        self.cookie_file = cookie_file
+        self.ttl         = ttl
+        self.margin      = margin
+        self._cookies    = None              # list of Playwright cookie dicts
+        self._fetched_at = 0.0
+        self._last_used  = 0.0
+        self._last_url   = "https://www.youtube.com"
+        self._retry_at   = 0.0               # background retry backoff after a failure
+        self._lock       = threading.Lock()  # guards _pending and the thread handle
+        self._pending    = None              # (done_event, error_holder) of the refresh in flight
+        self._requests   = queue.Queue()     # (video_url, done_event, error_holder) | None
+        self._thread     = None
+        self._stats      = {"refreshes": 0, "background_refreshes": 0, "failures": 0,
+                            "browser_launches": 0, "last_refresh_s": None, "total_refresh_s": 0.0}
+
+    # ── public API ──────────────────────────────────────────────────────────
+    def ensure_fresh(self, video_url: str):
+        """Blocks only if there is no usable jar; otherwise returns at once."""
+        self._last_used = time.monotonic()
+        self._last_url  = video_url
+        if self._is_fresh():
+            app.logger.info("▶ Reusing existing cookies (TTL not expired)")
+            return
+        with self._lock:
+            if self._is_fresh():
+                return                       # someone refreshed while we waited
+            if self._pending is None:        # single flight: later callers join this one
+                app.logger.info("▶ Refreshing cookies")
+                self._pending = (threading.Event(), [])
+                self._start()
+                self._requests.put((video_url, *self._pending))
+            done, error = self._pending
+
+        # wait outside the lock, and not forever: a hung browser must not
+        # hold this caller's NET_STAGE slot and everyone queued behind it
+        finished = done.wait(COOKIE_REFRESH_WAIT)
+        with self._lock:
+            if self._pending is not None and self._pending[0] is done:
+                self._pending = None
+                if not finished:
+                    self._stats["failures"] += 1
+        if not finished:
+            if self._cookies is None:
+                raise TimeoutError(f"Cookie refresh took longer than {COOKIE_REFRESH_WAIT}s")
+            app.logger.warning("Cookie refresh timed out; carrying on with the previous cookies")
+            return
+        if error:
+            raise error[0]
+
+    def jar(self) -> MozillaCookieJar:
+        """A private copy of the current cookies for one requests.Session."""
+        jar = MozillaCookieJar(self.cookie_file)
+        for c in self._cookies or []:
+            jar.set_cookie(requests.cookies.create_cookie(
+                name=c["name"], value=c["value"],
+                domain=c["domain"], path=c["path"],
+                secure=c["secure"], rest={"HttpOnly": c["httpOnly"]}
+            ))
+        return jar
+
+    def stats(self) -> dict:
+        out = dict(self._stats)
+        total = out.pop("total_refresh_s")
+        done = out["refreshes"] + out["background_refreshes"]
+        out["avg_refresh_s"] = round(total / done, 3) if done else None
+        out["jar_age_s"] = round(time.monotonic() - self._fetched_at, 1) if self._cookies else None
+        out["browser_running"] = bool(self._thread and self._thread.is_alive())
+        return out
+
+    def close(self):
+        if self._thread and self._thread.is_alive():
+            self._requests.put(None)
+            self._thread.join(timeout=10)
+
+    # ── browser thread ──────────────────────────────────────────────────────
+    def _is_fresh(self) -> bool:
+        return self._cookies is not None and time.monotonic() - self._fetched_at < self.ttl
+
+    def _start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="cookie-browser", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        try:
+            self._serve()
+        except Exception as e:
+            # Playwright itself failed to start: fail everyone waiting on us.
+            # Under the lock, so a request queued from now on starts a new
+            # thread instead of waiting on this one
+            app.logger.warning(f"Cookie browser thread failed ({e})")
+            self._stats["failures"] += 1
+            with self._lock:
+                self._thread = None
+                while True:
+                    try:
+                        item = self._requests.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item:
+                        item[2].append(e)
+                        item[1].set()
+
+    def _serve(self):
+        from playwright.sync_api import sync_playwright
+        with sync_playwright() as p:
+            browser = context = None
+            while True:
+                wait = None
+                if self._cookies is not None:
+                    due  = max(self._fetched_at + self.ttl - self.margin, self._retry_at)
+                    wait = max(due - time.monotonic(), 0)
+                try:
+                    item = self._requests.get(timeout=wait)
+                except queue.Empty:
+                    item = "background"
+                if item is None:
+                    break
+
+                if item == "background":
+                    if time.monotonic() - self._last_used > COOKIE_KEEPWARM_SECS:
+                        # idle: let the jar expire, next job refreshes in the foreground
+                        self._fetched_at = -self.ttl
+                        self._cookies    = None
+                        continue
+                    video_url, done, error = self._last_url, None, []
+                else:
+                    video_url, done, error = item
+                    if self._is_fresh():         # a background refresh beat us to it
+                        done.set()
+                        continue
+
+                try:
+                    if browser is None or not browser.is_connected():
+                        browser, context = self._launch(p)
+                    self._refresh(context, video_url, background=done is None)
+                except Exception as e:
+                    self._stats["failures"] += 1
+                    app.logger.warning(f"Cookie refresh failed ({e})")
+                    error.append(e)
+                    try:
+                        if browser:
+                            browser.close()
+                    except Exception:
+                        pass
+                    browser = context = None
+                    if done is None:
+                        # keep serving the old jar until it expires; retry a bit later
+                        self._retry_at = time.monotonic() + 15
+                finally:
+                    if done is not None:
+                        done.set()
+            if browser:
+                browser.close()
+
+    def _launch(self, p):
         browser = p.chromium.launch(
             headless=True,
             args=[
@@ -152,24 +976,48 @@ def refresh_cookies(video_url: str):
         context.add_init_script(
             "Object.defineProperty(navigator, 'webdriver', {get: () => undefined});"
         )
+        self._stats["browser_launches"] += 1
+        return browser, context
+
+    def _refresh(self, context, video_url: str, background: bool):
+        t0 = time.monotonic()
         page = context.new_page()
-        # 1) load home page (no banner will appear now)
-        page.goto("https://www.youtube.com", timeout=30_000)
-        # 2) visit the actual video (so YouTube sets video-level cookies)
-        page.goto(video_url, timeout=30_000)
-        page.wait_for_load_state("networkidle")
-
-        cookies = context.cookies()
-        jar = MozillaCookieJar(COOKIE_FILE)
-        for c in cookies:
-            jar.set_cookie(requests.cookies.create_cookie(
-                name=c["name"], value=c["value"],
-                domain=c["domain"], path=c["path"],
-                secure=c["secure"], rest={"HttpOnly": c["httpOnly"]}
-            ))
-        jar.save(ignore_discard=True, ignore_expires=True)
-        app.logger.info(f"Fetched fresh cookies ({len(cookies)} total) to {COOKIE_FILE}")
-        browser.close()
+        try:
+            # 1) load home page (no banner will appear now)
+            page.goto("https://www.youtube.com", timeout=30_000)
+            # 2) visit the actual video (so YouTube sets video-level cookies)
+            page.goto(video_url, timeout=30_000)
+            page.wait_for_load_state("networkidle")
+        finally:
+            page.close()
+
+        self._cookies    = context.cookies()
+        self._fetched_at = time.monotonic()
+
+        # atomic swap: readers of COOKIE_FILE never see a half-written jar
+        jar = self.jar()
+        tmp = f"{self.cookie_file}.{os.getpid()}.tmp"
+        jar.save(tmp, ignore_discard=True, ignore_expires=True)
+        os.replace(tmp, self.cookie_file)
+
+        secs = time.monotonic() - t0
+        STAGE_SECONDS["cookie_refresh"].observe(secs)
+        self._stats["background_refreshes" if background else "refreshes"] += 1
+        self._stats["last_refresh_s"] = round(secs, 3)
+        self._stats["total_refresh_s"] += secs
+        app.logger.info(f"Fetched fresh cookies ({len(self._cookies)} total) to {self.cookie_file} "
+                        f"in {secs:.2f}s{' (background)' if background else ''}")
+
+COOKIES = CookieService()
+atexit.register(COOKIES.close)
+
+def maybe_refresh_cookies(video_url: str):
+    """
+    Refresh only if the in-memory jar is missing or older than COOKIE_TTL.
+    With COOKIE_REFRESH=0 jobs run cookie-less and no browser is launched.
+    """
+    if COOKIE_REFRESH:
+        COOKIES.ensure_fresh(video_url)
 
 # ───────────────────────────────────────────────────────────────────────────────
 # HELPERS: Utility functions
@@ -178,9 +1026,25 @@ def refresh_cookies(video_url: str):
 def sanitize_filename(name: str) -> str:
     return re.sub(r'[\\/*?:"<>|]', "_", name)
 
-def get_download_folder(title: str) -> str:
-    safe = sanitize_filename(title)
-    folder = os.path.join("downloads", safe)
+def chapter_filenames(chapters, ext: str) -> list:
+    """
+    "<title>.<ext>" for each chapter; a repeated title gets " (2)", " (3)", ...
+    so no chapter's file overwrites another's.
+    """
+    names, seen = [], set()
+    for ch in chapters:
+        base = sanitize_filename(ch['title'])
+        name, n = f"{base}.{ext}", 1
+        while name in seen:
+            n += 1
+            name = f"{base} ({n}).{ext}"
+        seen.add(name)
+        names.append(name)
+    return names
+
+def get_download_folder(name: str) -> str:
+    safe = sanitize_filename(name)
+    folder = os.path.join(DOWNLOADS_DIR, safe)
     os.makedirs(folder, exist_ok=True)
     return folder
 
@@ -198,107 +1062,1450 @@ def extract_video_id(url: str) -> str:
     return parse_qs(p.query).get('v', [None])[0]
 
 # ───────────────────────────────────────────────────────────────────────────────
-# APP & TASK MANAGEMENT
+# HELPERS: Content-addressed result cache
 # ───────────────────────────────────────────────────────────────────────────────
 
-app     = Flask(__name__)
-tasks   = {}
+CACHE_STATS = {"hits": 0, "misses": 0, "evictions": 0}
+_cache_lock = threading.Lock()
 
-def background_task(task_id, youtube_url):
-    # 0) Log version & refresh cookies
-    app.logger.info(f"▶ yt-dlp version: {ytdlp_version}")
-    maybe_refresh_cookies(youtube_url)
-    start_time = time.time()
+def result_cache_key(video_id: str, out_format: str, chapters) -> str:
+    """
+    Hashes everything that determines the output files: video, format,
+    bitrate (or stream copy) and the exact chapter cuts and titles.
+    """
+    bitrate = MP3_BITRATE if out_format == "mp3" else "copy"
+    cuts = [(ch['start_time'], ch.get('end_time'), ch['title']) for ch in chapters]
+    if not cuts and AUTO_CHAPTERS:
+        # cut at silences later: the detection settings decide the output
+        cuts = ["auto", SILENCE_THRESHOLD_DB, SILENCE_MIN_SECS, AUTO_CHAPTER_MIN_SECS]
+    blob = json.dumps([video_id, out_format, bitrate, cuts], sort_keys=True)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()[:24]
+
+def job_key(video_id: str, out_format: str) -> str:
+    """Jobs with the same key produce the same output, so only one may be in flight."""
+    return f"{video_id}:{out_format}"
+
+def load_manifest(key: str, touch: bool = False):
+    """
+    Reads downloads/<key>/.result.json; None if the folder is not a finished
+    result. `touch` marks the entry as recently used for LRU eviction.
+    """
+    manifest = os.path.join(DOWNLOADS_DIR, sanitize_filename(key), RESULT_MANIFEST)
+    try:
+        with open(manifest, encoding="utf-8") as f:
+            result = json.load(f)
+        if touch:
+            os.utime(manifest)                 # LRU clock = manifest mtime
+    except (OSError, ValueError):
+        return None
+    return result
+
+def touching_result(iterable, key: str):
+    """
+    Passes a download's body through, touching result `key` now and then so
+    cache_evict leaves it alone (see RESULT_READ_GRACE) until the last byte.
+    """
+    manifest = os.path.join(DOWNLOADS_DIR, sanitize_filename(key), RESULT_MANIFEST)
+    touched = time.monotonic()
+    for block in iterable:
+        if time.monotonic() - touched > RESULT_READ_GRACE / 2:
+            touched = time.monotonic()
+            try:
+                os.utime(manifest)
+            except OSError:
+                pass
+        yield block
+
+def cache_lookup(key: str, record_miss: bool = True):
+    """
+    Returns the stored result dict for `key` (marking it recently used), or None.
+    """
+    result = load_manifest(key, touch=True)
+    with _cache_lock:
+        if result is not None:
+            CACHE_STATS["hits"] += 1
+        elif record_miss:
+            CACHE_STATS["misses"] += 1
+    return result
+
+def cache_store(key: str, result: dict, scratch: str = None):
+    """
+    Writes the manifest that turns downloads/<key>/ into a cache entry,
+    then evicts least-recently-used entries beyond the disk budget.
+    With `scratch`, the job's private dir becomes downloads/<key> in one
+    rename, so readers see either nothing or the finished result. If another
+    job published the same key first, theirs is kept and ours dropped.
+    """
+    def write_manifest(folder):
+        manifest = os.path.join(folder, RESULT_MANIFEST)
+        with open(manifest + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        os.replace(manifest + ".tmp", manifest)
+
+    if scratch is None:
+        write_manifest(os.path.join(DOWNLOADS_DIR, key))
+        cache_evict(keep=key)
+        return
+
+    os.makedirs(DOWNLOADS_DIR, exist_ok=True)
+    final = os.path.join(DOWNLOADS_DIR, key)
+    staging = scratch
+    if os.stat(scratch).st_dev != os.stat(DOWNLOADS_DIR).st_dev:
+        # scratch on tmpfs: copy next to the destination so the rename stays atomic
+        staging = os.path.join(DOWNLOADS_DIR, f".incoming-{uuid.uuid4().hex}")
+        shutil.copytree(scratch, staging)
+        shutil.rmtree(scratch, ignore_errors=True)
+    write_manifest(staging)
+    try:
+        os.rename(staging, final)
+    except OSError:
+        if load_manifest(key) is not None:
+            shutil.rmtree(staging, ignore_errors=True)     # identical result already published
+            return
+        # a folder without a manifest is debris from an older build: replace it
+        stale = os.path.join(DOWNLOADS_DIR, f".stale-{uuid.uuid4().hex}")
+        os.rename(final, stale)
+        os.rename(staging, final)
+        shutil.rmtree(stale, ignore_errors=True)
+    cache_evict(keep=key)
+
+def make_scratch_dir(task_id: str) -> str:
+    """A private working dir for one job; leftovers of crashed jobs are swept here."""
+    os.makedirs(SCRATCH_DIR, exist_ok=True)
+    cutoff = time.time() - SCRATCH_MAX_AGE
+    for name in os.listdir(SCRATCH_DIR):
+        path = os.path.join(SCRATCH_DIR, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+        except OSError:
+            pass
+    scratch = tempfile.mkdtemp(prefix=f"{task_id}-", dir=SCRATCH_DIR)
+    os.chmod(scratch, 0o755)                   # it becomes a public result folder
+    return scratch
+
+def cache_entries():
+    """Lists (last_used, size_mb, key) for every completed result folder."""
+    entries = []
+    if not os.path.isdir(DOWNLOADS_DIR):
+        return entries
+    for key in os.listdir(DOWNLOADS_DIR):
+        if key.startswith("."):
+            continue                           # scratch, staging and the task db
+        manifest = os.path.join(DOWNLOADS_DIR, key, RESULT_MANIFEST)
+        try:
+            last_used = os.path.getmtime(manifest)
+        except OSError:
+            continue                           # still being built (or not ours)
+        entries.append((last_used, get_folder_size_mb(os.path.join(DOWNLOADS_DIR, key)), key))
+    return entries
+
+def cache_evict(max_mb: float = None, keep: str = None):
+    """
+    Deletes least-recently-used result folders until the cache fits in
+    max_mb (RESULT_CACHE_MAX_MB by default). `keep`, and anything read in
+    the last RESULT_READ_GRACE seconds (it may still be streaming), is
+    never evicted.
+    """
+    max_mb = RESULT_CACHE_MAX_MB if max_mb is None else max_mb
+    in_use = time.time() - RESULT_READ_GRACE
+    with _cache_lock:
+        entries = sorted(cache_entries())
+        total = sum(size for _, size, _ in entries)
+        for last_used, size, key in entries:
+            if total <= max_mb or last_used > in_use:
+                break                          # oldest first: the rest are recent too
+            if key == keep:
+                continue
+            shutil.rmtree(os.path.join(DOWNLOADS_DIR, key), ignore_errors=True)
+            total -= size
+            CACHE_STATS["evictions"] += 1
+            app.logger.info(f"Evicted cached result {key} ({size:.1f} MB)")
+
+# ───────────────────────────────────────────────────────────────────────────────
+# HELPERS: Streaming, uncompressed ZIP with a known size (Range-friendly)
+# ───────────────────────────────────────────────────────────────────────────────
+
+STREAM_CHUNK = 256 * 1024
+
+# CRCs of served files, keyed by (path, size, mtime, offset, length)
+CRC_CACHE = TTLCache(4096, 24 * 3600)
+
+def file_crc32(path: str, offset: int = 0, length: int = None) -> int:
+    """CRC-32 of a file (or a byte slice of it), memoised while the file is unchanged."""
+    st = os.stat(path)
+    length = st.st_size - offset if length is None else length
+
+    def compute():
+        crc = 0
+        with open(path, "rb") as f:
+            f.seek(offset)
+            left = length
+            while left > 0:
+                block = f.read(min(1024 * 1024, left))
+                if not block:
+                    break
+                crc = zlib.crc32(block, crc)
+                left -= len(block)
+        return crc
+    return CRC_CACHE.get_or_load((path, st.st_size, st.st_mtime_ns, offset, length), compute)
+
+def _dos_datetime(ts: float):
+    t = time.localtime(ts)
+    year = max(t.tm_year, 1980)
+    return (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2), \
+           ((year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+
+def stored_zip_layout(entries):
+    """
+    Lays out a ZIP_STORED archive for `entries` = [(arcname, path, offset, length)]
+    without reading more than the CRCs. Returns (parts, total_size) where each
+    part is bytes or a (path, offset, length) file slice, in archive order.
+    The layout is deterministic, so any byte range can be served on its own.
+    """
+    parts, central, pos = [], [], 0
+    for arcname, path, offset, length in entries:
+        name = arcname.encode("utf-8")
+        crc = file_crc32(path, offset, length)
+        mtime, mdate = _dos_datetime(os.path.getmtime(path))
+        local = struct.pack("<IHHHHHIIIHH", 0x04034b50, 20, 0x0800, 0,
+                            mtime, mdate, crc, length, length, len(name), 0) + name
+        central.append(struct.pack("<IHHHHHHIIIHHHHHII", 0x02014b50, 0x0314, 20, 0x0800, 0,
+                                   mtime, mdate, crc, length, length, len(name), 0, 0, 0, 0,
+                                   0o100644 << 16, pos) + name)
+        parts += [local, (path, offset, length)]
+        pos += len(local) + length
+
+    cd = b"".join(central)
+    eocd = struct.pack("<IHHHHIIH", 0x06054b50, 0, 0, len(central), len(central), len(cd), pos, 0)
+    total = pos + len(cd) + len(eocd)
+    if total >= 0xFFFFFFFF or len(central) >= 0xFFFF:
+        raise ValueError("Archive too large for a non-ZIP64 stream")
+    parts += [cd, eocd]
+    return parts, total
+
+def iter_parts(parts, start: int, end: int):
+    """Yields bytes start..end (inclusive) of the concatenated parts."""
+    pos = 0
+    for part in parts:
+        size = part[2] if isinstance(part, tuple) else len(part)
+        lo, hi = max(start, pos), min(end + 1, pos + size)
+        if lo < hi:
+            if isinstance(part, tuple):
+                path, offset, _ = part
+                with open(path, "rb") as f:
+                    f.seek(offset + lo - pos)
+                    left = hi - lo
+                    while left > 0:
+                        block = f.read(min(STREAM_CHUNK, left))
+                        if not block:
+                            break
+                        left -= len(block)
+                        yield block
+            else:
+                yield part[lo - pos:hi - pos]
+        pos += size
+        if pos > end:
+            break
+
+def ranged_response(parts, total: int, etag: str, mimetype: str, download_name: str):
+    """
+    Streams `parts` with Content-Length, answering single Range requests
+    (honouring If-Range) with 206 so interrupted downloads can resume.
+    Multi-range requests get the whole body (200), which RFC 9110 allows.
+    """
+    start, end, status = 0, total - 1, 200
+    ascii_name = download_name.encode("ascii", "ignore").decode().replace('"', "") or "download"
+    headers = {
+        "Accept-Ranges":       "bytes",
+        "ETag":                f'"{etag}"',
+        "Content-Disposition": (
+            f'attachment; filename="{ascii_name}"; '
+            f"filename*=UTF-8''{quote(download_name)}"
+        ),
+    }
+    if_range = request.headers.get("If-Range")    # stale copy → send it all again
+    if request.range and len(request.range.ranges) == 1 and if_range in (None, headers["ETag"]):
+        rng = request.range.range_for_length(total)
+        if rng is None:
+            headers["Content-Range"] = f"bytes */{total}"
+            return Response(status=416, headers=headers)
+        start, end, status = rng[0], rng[1] - 1, 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{total}"
+    headers["Content-Length"] = str(end - start + 1)
+    return Response(iter_parts(parts, start, end), status=status,
+                    headers=headers, mimetype=mimetype, direct_passthrough=True)
 
-    # ─── Load the cookies Playwright just saved:
-    jar = MozillaCookieJar(COOKIE_FILE)
-    jar.load(ignore_discard=True, ignore_expires=True)
+# ───────────────────────────────────────────────────────────────────────────────
+# HELPERS: MP3 frame index (chapters as byte slices of one source file)
+# ───────────────────────────────────────────────────────────────────────────────
 
-    # ─── Create a session that uses those cookies + your standard headers
+# Layer III bitrates (kbit/s) by bitrate index, and sample rates by version bits
+_MP3_BITRATES = {
+    "mpeg1": (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 0),
+    "mpeg2": (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160, 0),
+}
+_MP3_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+def mp3_frame_info(header: bytes):
+    """(frame_bytes, sample_rate, samples_per_frame) for a Layer III frame header, else None."""
+    h = int.from_bytes(header, "big")
+    version, layer = (h >> 19) & 3, (h >> 17) & 3
+    br_idx, sr_idx = (h >> 12) & 0xF, (h >> 10) & 3
+    if h >> 21 != 0x7FF or version == 1 or layer != 1 or br_idx in (0, 15) or sr_idx == 3:
+        return None
+    rate, padding = _MP3_RATES[version][sr_idx], (h >> 9) & 1
+    if version == 3:
+        return 144000 * _MP3_BITRATES["mpeg1"][br_idx] // rate + padding, rate, 1152
+    return 72000 * _MP3_BITRATES["mpeg2"][br_idx] // rate + padding, rate, 576
+
+class FrameIndex:
+    """
+    Byte offset of every audio frame in an MP3, persisted next to it as
+    `<source>.idx`: a small header, then count+1 little-endian uint32 offsets
+    (the last is where audio data ends). Every frame holds the same number of
+    samples, so frame i starts at i * samples_per_frame / sample_rate seconds
+    and no timestamps need storing. Lookups read two offsets from disk, so
+    serving a chapter costs the same however long the source is.
+    """
+
+    HEADER = struct.Struct("<8sIII")       # magic, sample_rate, samples_per_frame, frames
+    MAGIC  = b"MP3FIDX1"
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            magic, self.sample_rate, self.samples_per_frame, self.frames = \
+                self.HEADER.unpack(f.read(self.HEADER.size))
+        if magic != self.MAGIC:
+            raise ValueError(f"Not a frame index: {path}")
+
+    @classmethod
+    def build(cls, source: str, path: str = None):
+        """Scans `source` once (ID3 tags and the Xing/Info frame are skipped) and writes the index."""
+        path = path or source + ".idx"
+        offsets, rate, spf = array("I"), None, None
+        with open(source, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            size, pos = len(m), 0
+            if m[:3] == b"ID3":                # ID3v2: syncsafe size, optional footer
+                pos = 10 + sum((b & 0x7F) << (7 * (3 - i)) for i, b in enumerate(m[6:10]))
+                pos += 10 if m[5] & 0x10 else 0
+            end = pos
+            while pos + 4 <= size:
+                info = mp3_frame_info(m[pos:pos + 4])
+                if info is None or (rate and info[1] != rate) or pos + info[0] > size:
+                    if m[pos:pos + 3] == b"TAG":
+                        break                  # ID3v1 trailer
+                    pos = m.find(b"\xff", pos + 1)
+                    if pos < 0:
+                        break
+                    continue                   # resync on the next frame header
+                if rate is None:
+                    rate, spf = info[1], info[2]
+                    if any(m.find(tag, pos + 4, pos + 40) >= 0 for tag in (b"Xing", b"Info", b"VBRI")):
+                        pos += info[0]         # encoder info frame, not audio
+                        continue
+                offsets.append(pos)
+                pos += info[0]
+                end = pos
+        if rate is None:
+            raise ValueError(f"No MP3 frames in {source}")
+        offsets.append(end)
+        if sys.byteorder != "little":
+            offsets.byteswap()
+
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(cls.HEADER.pack(cls.MAGIC, rate, spf, len(offsets) - 1))
+            f.write(offsets.tobytes())
+        os.replace(tmp, path)
+        return cls(path)
+
+    def frame_at(self, secs: float) -> int:
+        """Index of the frame boundary nearest `secs`."""
+        return min(max(round(secs * self.sample_rate / self.samples_per_frame), 0), self.frames)
+
+    def byte_range(self, first: int, last: int):
+        """(offset, length) in the source of frames first..last-1."""
+        with open(self.path, "rb") as f:
+            f.seek(self.HEADER.size + 4 * first)
+            start = int.from_bytes(f.read(4), "little")
+            f.seek(self.HEADER.size + 4 * last)
+            stop = int.from_bytes(f.read(4), "little")
+        return start, stop - start
+
+def slice_chapters(src: str, chapters, folder: str):
+    """
+    Keeps `src` as the folder's MP3 source, indexes its frames and maps every
+    chapter to a [first_frame, last_frame) range. Nothing is cut or copied.
+    Returns (chapter filenames, {filename: [first, last]}).
+    """
+    if not chapters:
+        os.remove(src)
+        return [], {}
+    source = os.path.join(folder, MP3_SOURCE_NAME)
+    os.replace(src, source)
+    index = FrameIndex.build(source)
+    kept, frames = [], []
+    for ch in chapters:
+        first, last = index.frame_at(ch['start_time']), index.frame_at(ch['end_time'])
+        if last > first:
+            kept.append(ch)
+            frames.append([first, last])
+    names = chapter_filenames(kept, "mp3")
+    return names, dict(zip(names, frames))
+
+def chapter_slice(dirpath: str, result: dict, filename: str):
+    """(path, offset, length) of a sliced chapter, or None if it is a real file."""
+    frames = (result.get('slices') or {}).get(filename)
+    if not frames:
+        return None
+    source = os.path.join(dirpath, result['source'])
+    offset, length = FrameIndex(source + ".idx").byte_range(*frames)
+    return source, offset, length
+
+# ───────────────────────────────────────────────────────────────────────────────
+# HELPERS: Single-pass chapter splitting
+# ───────────────────────────────────────────────────────────────────────────────
+
+_SEGMENT_RE = re.compile(r"\.seg(\d+)\.")
+
+def split_chapters(src: str, chapters, folder: str, ext: str = "mp3", on_progress=None,
+                   codec_args=None, feed=None):
+    """
+    Cuts every chapter out of `src` with ONE ffmpeg run (segment muxer + stream
+    copy), so the source is demuxed once instead of once per chapter.
+    ffmpeg reports each finished segment on stdout; we rename it to its chapter
+    title and call on_progress(done, total) right away.
+
+    `codec_args` replaces the default stream copy (e.g. to encode MP3 while
+    cutting). With `feed` (an iterable of bytes) the source is read from
+    ffmpeg's stdin instead of `src`, so cutting starts while bytes arrive.
+    Returns the chapter filenames (relative to `folder`) in chapter order;
+    chapters that are empty or out of order are skipped.
+    """
+    # ffmpeg rejects cut times that don't increase: cut in start order and
+    # skip chapters that are empty or start where the previous one did
+    order, prev = [], None
+    for i in sorted(range(len(chapters)), key=lambda i: chapters[i]['start_time']):
+        ch = chapters[i]
+        if ch.get('end_time', float("inf")) <= ch['start_time'] or ch['start_time'] == prev:
+            continue
+        order.append(i)
+        prev = ch['start_time']
+    if not order:
+        return []
+    first, last = chapters[order[0]], chapters[order[-1]]
+    parts = dict(zip(sorted(order), chapter_filenames([chapters[i] for i in sorted(order)], ext)))
+
+    # Audio before the first chapter becomes a leading segment we throw away
+    lead = 1 if first['start_time'] > 0 else 0
+    cuts = [chapters[i]['start_time'] for i in order[1 - lead:]]
+    if last.get('end_time', 0) > last['start_time']:
+        cuts.append(last['end_time'])          # anything after that is dropped
+
+    pattern = os.path.join(folder, f".seg%03d.{ext}")
+    cmd = [
+        "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+        "-i", "pipe:0" if feed is not None else src,
+        "-map", "0:a", *(codec_args or ["-c", "copy"]),
+        "-f", "segment",
+        "-segment_times", ",".join(str(t) for t in cuts),
+        "-reset_timestamps", "1",
+        "-segment_list", "pipe:1",
+        "-segment_list_type", "csv",
+        pattern,
+    ]
+
+    names = [None] * len(chapters)
+    done  = 0
+    proc  = subprocess.Popen(
+        cmd, text=True, stdout=subprocess.PIPE,
+        stdin=subprocess.PIPE if feed is not None else subprocess.DEVNULL,
+    )
+
+    # Feed stdin from a helper thread while this one reads segment reports
+    pump_thread, feed_errors = feed_stdin(proc, feed)
+
+    for line in proc.stdout:
+        seg_name = line.split(",", 1)[0]
+        m = _SEGMENT_RE.search(seg_name)
+        if not m:
+            continue
+        seg_path = os.path.join(folder, seg_name)
+        idx = int(m.group(1)) - lead
+        if not 0 <= idx < len(order):
+            os.remove(seg_path)
+            continue
+        part = parts[order[idx]]
+        os.replace(seg_path, os.path.join(folder, part))
+        names[order[idx]] = part
+        done += 1
+        if on_progress:
+            on_progress(done, len(order))
+
+    proc.wait()
+    if pump_thread:
+        pump_thread.join()
+    if feed_errors:
+        raise feed_errors[0]
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, cmd)
+    return [n for n in names if n]
+
+def feed_stdin(proc, feed):
+    """
+    Writes the byte chunks of `feed` to proc's stdin from a helper thread.
+    Returns (thread, errors); a failed feed kills the process, and the caller
+    re-raises errors[0] after joining the thread.
+    """
+    errors = []
+    if feed is None:
+        return None, errors
+    stdin = getattr(proc.stdin, "buffer", proc.stdin)
+
+    def pump():
+        try:
+            for chunk in feed:
+                stdin.write(chunk)
+        except BrokenPipeError:
+            pass                     # ffmpeg exited early; its exit code says why
+        except Exception as e:
+            errors.append(e)         # a cut-short source must not look like success
+            proc.kill()
+        finally:
+            try:
+                stdin.close()
+            except BrokenPipeError:
+                pass
+
+    thread = threading.Thread(target=pump, daemon=True)
+    thread.start()
+    return thread, errors
+
+def encode_audio(src, dst: str, codec_args, feed=None):
+    """One ffmpeg run from `src` (or the `feed` byte iterable) to a single file."""
+    cmd = [
+        "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+        "-i", "pipe:0" if feed is not None else src,
+        "-map", "0:a", *codec_args, dst,
+    ]
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE if feed is not None else subprocess.DEVNULL)
+    pump_thread, feed_errors = feed_stdin(proc, feed)
+    proc.wait()
+    if pump_thread:
+        pump_thread.join()
+    if feed_errors:
+        raise feed_errors[0]
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, cmd)
+    return dst
+
+def iter_download(session, url: str, total: int = 0, on_progress=None, chunk_size: int = 256 * 1024):
+    """
+    Yields the response body of a streamed GET in chunks, reporting
+    on_progress(received, total) as bytes arrive. `total` falls back to the
+    Content-Length header when the format entry had no contentLength.
+    """
+    with session.get(url, stream=True) as r:
+        r.raise_for_status()
+        total = total or int(r.headers.get("Content-Length") or 0)
+        received = 0
+        for chunk in r.iter_content(chunk_size):
+            received += len(chunk)
+            record_transfer(url, len(chunk))
+            if on_progress:
+                on_progress(received, total)
+            yield chunk
+
+# ───────────────────────────────────────────────────────────────────────────────
+# HELPERS: Parallel chapter encoding (decode once, encode chapters on every core)
+# ───────────────────────────────────────────────────────────────────────────────
+
+def decode_pcm(src: str, dst: str):
+    """
+    Decodes `src` once to 16-bit PCM WAV.
+    Returns (sample_rate, channels, frames, byte offset of the sample data).
+    """
+    subprocess.run([
+        "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+        "-i", src, "-map", "0:a", "-c:a", "pcm_s16le", "-f", "wav", dst,
+    ], check=True)
+    with wave.open(dst, "rb") as w:
+        rate, channels, frames = w.getframerate(), w.getnchannels(), w.getnframes()
+    # wave only reports positions inside the chunk: walk the RIFF chunks for
+    # the file offset where the `data` samples start
+    with open(dst, "rb") as f:
+        f.seek(12)                             # "RIFF", size, "WAVE"
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError(f"No data chunk in {dst}")
+            chunk_id, size = struct.unpack("<4sI", header)
+            if chunk_id == b"data":
+                return rate, channels, frames, f.tell()
+            f.seek(size + (size & 1), os.SEEK_CUR)   # chunks are word-aligned
+
+def encode_chapters(src: str, chapters, folder: str, ext: str = "mp3", codec_args=None,
+                    on_progress=None, workers: int = None):
+    """
+    Decodes `src` once to PCM, then encodes every chapter from it with its
+    own ffmpeg process, up to `workers` (default CPU_SLOTS) at a time. Each
+    process holds a CPU_STAGE slot, so concurrent jobs share the cores
+    instead of oversubscribing them; don't call this while holding one.
+
+    Chapter boundaries are sample indices, round(time * rate), so neighbours
+    share their boundary sample exactly: each ffmpeg starts at its first
+    sample by byte offset into the PCM and stops at its last with atrim.
+    LAME's encoder delay and padding are recorded in each file's Xing header
+    for gapless playback. Returns the chapter filenames in chapter order.
+    """
+    if not chapters:
+        return []
+    codec_args = codec_args or ["-c:a", "libmp3lame", "-b:a", MP3_BITRATE]
+    pcm = os.path.join(folder, ".decoded.wav")
+    with CPU_STAGE:
+        rate, channels, frames, data_offset = decode_pcm(src, pcm)
+    block = channels * 2
+
+    jobs = []                                  # (chapter index, first sample, sample count)
+    for i, ch in enumerate(chapters):
+        first = min(round(ch['start_time'] * rate), frames)
+        last  = min(round((ch.get('end_time') or frames / rate) * rate), frames)
+        if last > first:
+            jobs.append((i, first, last - first))
+
+    done, lock = 0, threading.Lock()
+
+    def encode(job):
+        nonlocal done
+        i, first, count = job
+        tmp = os.path.join(folder, f".enc{i:03d}.{ext}")
+        cmd = [
+            "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+            "-skip_initial_bytes", str(data_offset + first * block),
+            "-f", "s16le", "-ar", str(rate), "-ac", str(channels), "-i", pcm,
+            "-af", f"atrim=end_sample={count}", *codec_args, tmp,
+        ]
+        with CPU_STAGE:
+            subprocess.run(cmd, check=True, stdin=subprocess.DEVNULL)
+        with lock:
+            done += 1
+            finished = done
+        if on_progress:
+            on_progress(finished, len(jobs))
+        return i, tmp
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers or CPU_SLOTS, len(jobs)))) as pool:
+            encoded = sorted(pool.map(encode, jobs))
+    finally:
+        os.remove(pcm)
+
+    names = chapter_filenames([chapters[i] for i, _ in encoded], ext)
+    for (_, tmp), part in zip(encoded, names):
+        os.replace(tmp, os.path.join(folder, part))
+    return names
+
+# ───────────────────────────────────────────────────────────────────────────────
+# HELPERS: Silence-based auto-chaptering (NumPy RMS over streamed PCM)
+# ───────────────────────────────────────────────────────────────────────────────
+
+SILENCE_SAMPLE_RATE = 8000          # mono 8 kHz is plenty for an energy envelope
+SILENCE_WINDOW_SECS = 0.05
+SILENCE_BLOCK_SECS  = 30            # PCM decoded per read; memory stays flat
+
+def find_silences(src: str, threshold_db: float = SILENCE_THRESHOLD_DB,
+                  min_silence: float = SILENCE_MIN_SECS):
+    """
+    Streams `src` through ffmpeg as 16-bit mono PCM and computes RMS energy
+    per SILENCE_WINDOW_SECS window with NumPy, one block at a time.
+    Returns ([(gap_start, gap_end), ...] for gaps of at least `min_silence`
+    seconds below `threshold_db` dBFS, total duration in seconds).
+    """
+    import numpy as np
+
+    window = int(SILENCE_SAMPLE_RATE * SILENCE_WINDOW_SECS)
+    block  = window * int(SILENCE_BLOCK_SECS / SILENCE_WINDOW_SECS)
+    # compare mean square against the threshold instead of taking log10 per window
+    limit  = (10 ** (threshold_db / 20) * 32768) ** 2
+    cmd = [
+        "ffmpeg", "-hide_banner", "-loglevel", "error", "-i", src,
+        # a short resampling filter: this is an energy envelope, not audio anyone hears
+        "-map", "0:a", "-af", f"aformat=channel_layouts=mono,aresample={SILENCE_SAMPLE_RATE}:filter_size=8",
+        "-f", "s16le", "pipe:1",
+    ]
+    gaps, run_start, windows = [], None, 0
+    carry = np.empty(0, dtype=np.int16)
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stdin=subprocess.DEVNULL)
+    try:
+        while True:
+            raw = proc.stdout.read(block * 2)
+            if not raw:
+                break
+            pcm = np.concatenate((carry, np.frombuffer(raw, dtype=np.int16)))
+            usable = len(pcm) - len(pcm) % window
+            pcm, carry = pcm[:usable], pcm[usable:]
+            if not usable:
+                continue
+            frames = pcm.astype(np.float32).reshape(-1, window)
+            quiet  = np.einsum("ij,ij->i", frames, frames) / window < limit
+
+            # edges of quiet runs within this block, continuing any open run
+            edges = np.flatnonzero(np.diff(quiet.astype(np.int8))) + 1
+            bounds = np.concatenate(([0], edges, [len(quiet)]))
+            for lo, hi in zip(bounds[:-1], bounds[1:]):
+                if quiet[lo]:
+                    if run_start is None:
+                        run_start = windows + lo
+                elif run_start is not None:
+                    gaps.append((run_start, windows + lo))
+                    run_start = None
+            windows += len(quiet)
+        if run_start is not None:
+            gaps.append((run_start, windows))
+    finally:
+        proc.stdout.close()
+        proc.wait()
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, cmd)
+
+    duration = (windows * window + len(carry)) / SILENCE_SAMPLE_RATE
+    min_windows = min_silence / SILENCE_WINDOW_SECS
+    return [(a * SILENCE_WINDOW_SECS, b * SILENCE_WINDOW_SECS)
+            for a, b in gaps if b - a >= min_windows], duration
+
+def silence_chapters(src: str, min_chapter: float = AUTO_CHAPTER_MIN_SECS, **detect):
+    """
+    Chapters for a track without any: cut in the middle of each silence gap,
+    skipping cuts that would leave a chapter shorter than `min_chapter`.
+    Returns [{start_time, end_time, title}] covering the whole track.
+    """
+    gaps, duration = find_silences(src, **detect)
+    cuts, last = [], 0.0
+    for gap_start, gap_end in gaps:
+        if gap_start <= 0 or gap_end >= duration:
+            continue                            # leading / trailing silence
+        cut = round((gap_start + gap_end) / 2, 3)
+        if cut - last >= min_chapter and duration - cut >= min_chapter:
+            cuts.append(cut)
+            last = cut
+    starts = [0.0] + cuts
+    return [
+        {"start_time": start,
+         "end_time":   starts[i + 1] if i + 1 < len(starts) else round(duration, 3),
+         "title":      f"Part {i + 1:02d}"}
+        for i, start in enumerate(starts)
+    ]
+
+# ───────────────────────────────────────────────────────────────────────────────
+# HELPERS: Shared HTTP transport (pooled keep-alive connections)
+# ───────────────────────────────────────────────────────────────────────────────
+
+class PooledAdapter(HTTPAdapter):
+    """
+    The one transport adapter every job's Session is mounted on, so the
+    player call and the media ranges reuse warm connections across jobs
+    instead of paying TCP+TLS setup each time. Adds default connect/read
+    timeouts and keeps the counters of pools urllib3 drops (LRU over
+    HTTP_POOL_HOSTS), so the totals in stats() never go backwards.
+    """
+
+    def __init__(self, timeout, **kwargs):
+        self.timeout  = timeout
+        self._retired = {"connections": 0, "requests": 0}
+        self._lock    = threading.Lock()
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pools.dispose_func = self._retire
+
+    def _retire(self, pool):
+        with self._lock:
+            self._retired["connections"] += pool.num_connections
+            self._retired["requests"]    += pool.num_requests
+        pool.close()
+
+    def send(self, request, timeout=None, **kwargs):
+        return super().send(request, timeout=timeout or self.timeout, **kwargs)
+
+    def close(self):
+        """Sessions are per job and may be closed; the shared pools stay open."""
+
+    def stats(self) -> dict:
+        hosts = {}
+        pools = self.poolmanager.pools
+        with pools.lock:                       # read in place: pools[key] would reorder the LRU
+            live = list(pools._container.values())
+        for pool in live:
+            if pool.pool is None:
+                continue
+            idle = sum(conn is not None for conn in list(pool.pool.queue))
+            hosts[f"{pool.scheme}://{pool.host}:{pool.port}"] = {
+                "connections_opened": pool.num_connections,
+                "requests":           pool.num_requests,
+                "idle":               idle,
+                "in_use":             pool.pool.maxsize - pool.pool.qsize(),
+                "maxsize":            pool.pool.maxsize,
+            }
+        with self._lock:
+            opened = self._retired["connections"] + sum(h["connections_opened"] for h in hosts.values())
+            sent   = self._retired["requests"] + sum(h["requests"] for h in hosts.values())
+        return {
+            "connections_opened": opened,
+            "requests":           sent,
+            "reuse_ratio":        round(1 - opened / sent, 3) if sent else None,
+            "pools":              len(hosts),
+            "idle":               sum(h["idle"] for h in hosts.values()),
+            "in_use":             sum(h["in_use"] for h in hosts.values()),
+            "hosts":              hosts,
+        }
+
+HTTP_ADAPTER = PooledAdapter(
+    timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT),
+    pool_connections=HTTP_POOL_HOSTS,
+    pool_maxsize=HTTP_POOL_MAXSIZE,
+    pool_block=True,
+    max_retries=Retry(
+        total=HTTP_RETRIES,
+        backoff_factor=HTTP_BACKOFF,
+        status_forcelist=(500, 502, 503, 504),
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS | {"POST"},   # the player POST only reads
+        raise_on_status=False,                                      # callers raise_for_status()
+    ),
+)
+
+def http_session(cookies=None) -> requests.Session:
+    """
+    A per-job Session (its own headers and cookie jar) on the shared
+    HTTP_ADAPTER. Cheap to create; closing it leaves the pools alone.
+    """
     session = requests.Session()
+    session.mount("https://", HTTP_ADAPTER)
+    session.mount("http://", HTTP_ADAPTER)
     session.headers.update(COMMON_HEADERS)
-    session.cookies = jar
+    if cookies is not None:
+        session.cookies = cookies
+    return session
+
+# ───────────────────────────────────────────────────────────────────────────────
+# HELPERS: Parallel ranged downloader
+# ───────────────────────────────────────────────────────────────────────────────
+
+def probe_content_length(session, url: str) -> int:
+    """
+    Asks for the first byte only. Returns the full size if the server honours
+    Range requests, 0 otherwise (caller then falls back to one plain GET).
+    """
+    with session.get(url, headers={"Range": "bytes=0-0"}, stream=True) as r:
+        r.raise_for_status()
+        if r.status_code != 206:
+            return 0
+        m = re.search(r"/(\d+)$", r.headers.get("Content-Range", ""))
+        return int(m.group(1)) if m else 0
+
+def download_ranged(session, url: str, dst: str, total: int = 0, on_progress=None,
+                    workers: int = DOWNLOAD_WORKERS, range_size: int = DOWNLOAD_RANGE_BYTES,
+                    retries: int = DOWNLOAD_RETRIES):
+    """
+    Downloads `url` into `dst` as byte ranges fetched by a small thread pool,
+    each written straight to its offset in a preallocated file.
+    A dropped range is re-requested from the last byte it wrote, so a flaky
+    connection only costs the missing tail of that range.
+    `total` (e.g. the format's contentLength) skips the size probe.
+    """
+    total = total or probe_content_length(session, url)
+    if not total:
+        with open(dst, "wb") as out:
+            for chunk in iter_download(session, url, on_progress=on_progress,
+                                       chunk_size=1024 * 1024):
+                out.write(chunk)
+        return dst
+
+    with open(dst, "wb") as out:
+        out.truncate(total)
+
+    lock     = threading.Lock()
+    received = 0
+    failed   = threading.Event()
+
+    def fetch(start, end):
+        nonlocal received
+        pos, attempt = start, 0
+        with open(dst, "r+b") as out:
+            while pos <= end and not failed.is_set():
+                try:
+                    with session.get(url, headers={"Range": f"bytes={pos}-{end}"}, stream=True) as r:
+                        r.raise_for_status()
+                        if r.status_code != 206:
+                            raise IOError(f"range {pos}-{end} answered with HTTP {r.status_code}")
+                        out.seek(pos)
+                        for chunk in r.iter_content(256 * 1024):
+                            chunk = chunk[:end - pos + 1]
+                            out.write(chunk)
+                            pos += len(chunk)
+                            record_transfer(url, len(chunk))
+                            with lock:
+                                received += len(chunk)
+                                done = received
+                            if on_progress:
+                                on_progress(done, total)
+                            if pos > end:
+                                break
+                    if pos <= end:
+                        raise IOError(f"range {start}-{end} ended early at byte {pos}")
+                except (requests.RequestException, IOError) as e:
+                    attempt += 1
+                    if attempt > retries:
+                        failed.set()
+                        raise
+                    app.logger.warning(f"Range {pos}-{end} failed ({e}); retry {attempt}/{retries}")
+                    time.sleep(min(0.5 * 2 ** (attempt - 1), 8))
+
+    ranges = [(a, min(a + range_size, total) - 1) for a in range(0, total, range_size)]
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(ranges)))) as pool:
+        for fut in [pool.submit(fetch, a, b) for a, b in ranges]:
+            fut.result()
+    return dst
+
+# ───────────────────────────────────────────────────────────────────────────────
+# APP & TASK MANAGEMENT
+# ───────────────────────────────────────────────────────────────────────────────
+
+USE_X_SENDFILE = os.environ.get("USE_X_SENDFILE", "").lower() in ("1", "true", "yes")
+
+# ───────────────────────────────────────────────────────────────────────────────
+# TASK STATE STORE (pluggable: in-memory or SQLite/WAL shared across workers)
+# ───────────────────────────────────────────────────────────────────────────────
 
+def worker_id() -> str:
+    """Owner tag for job claims: this host and process."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def owner_alive(owner: str) -> bool:
+    """False once `owner` is a process on this host that no longer exists."""
+    host, _, pid = owner.rpartition(":")
+    if host != socket.gethostname():
+        return True                          # another container: its heartbeat decides
     try:
-        # 1) Build extractor args
-        extractor_args = [
-            'player_skip=webpage,configs',
-            'player_client=tv'
-        ]
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, ValueError):
+        pass
+    return True
+
+class MemoryTaskStore:
+    """Process-local task store; fine for a single gunicorn worker."""
+
+    def __init__(self, ttl: float = TASK_TTL):
+        self.ttl   = ttl
+        self._data = {}                      # task_id → [fields, version, expires_at]
+        self._claims = {}                    # job key → (task_id, expires_at)
+        self._lock = threading.Lock()
+
+    def create(self, task_id, fields: dict):
+        with self._lock:
+            self._data[task_id] = [dict(fields), 1, time.time() + self.ttl]
+
+    def get(self, task_id):
+        with self._lock:
+            row = self._data.get(task_id)
+            if row is None or row[2] < time.time():
+                return None
+            return copy.deepcopy(row[0])
+
+    def update(self, task_id, fields: dict):
+        with self._lock:
+            row = self._data.get(task_id)
+            if row is None:
+                return None
+            row[0].update(copy.deepcopy(fields))
+            row[1] += 1
+            row[2] = time.time() + self.ttl
+            return row[1]
+
+    def version(self, task_id) -> int:
+        with self._lock:
+            row = self._data.get(task_id)
+            return row[1] if row else 0
+
+    def versions(self, task_ids) -> dict:
+        with self._lock:
+            return {t: (self._data[t][1] if t in self._data else 0) for t in task_ids}
+
+    def delete(self, task_id):
+        with self._lock:
+            self._data.pop(task_id, None)
+
+    def claim(self, key, task_id, ttl: float = JOB_CLAIM_TTL):
+        """Makes `task_id` the job for `key` unless a live task holds it; returns the holder."""
+        now = time.time()
+        with self._lock:
+            holder = self._claims.get(key)
+            if holder:
+                row = self._data.get(holder[0])
+                if row and row[2] >= now and row[0].get("status") not in ("done", "error"):
+                    if holder[1] >= now:
+                        return holder[0]
+                    self._orphan_locked(holder[0])
+            self._claims[key] = (task_id, now + ttl)
+            return task_id
+
+    def renew(self, task_ids, ttl: float = JOB_CLAIM_TTL):
+        """Heartbeat: extends the claims held by these tasks."""
+        task_ids, expires = set(task_ids), time.time() + ttl
+        with self._lock:
+            for key, (tid, _) in self._claims.items():
+                if tid in task_ids:
+                    self._claims[key] = (tid, expires)
+
+    def release(self, key, task_id):
+        with self._lock:
+            if self._claims.get(key, (None,))[0] == task_id:
+                del self._claims[key]
+
+    def _orphan_locked(self, task_id):
+        row = self._data.get(task_id)
+        if row and row[0].get("status") not in ("done", "error"):
+            row[0].update(status="error", error=ORPHANED_JOB_ERROR, queue_position=None)
+            row[1] += 1
+
+    def expire(self) -> int:
+        now = time.time()
+        with self._lock:
+            dead = [tid for tid, row in self._data.items() if row[2] < now]
+            for tid in dead:
+                del self._data[tid]
+            for key in [k for k, c in self._claims.items() if c[1] < now]:
+                self._orphan_locked(self._claims.pop(key)[0])
+        return len(dead)
+
+class SQLiteTaskStore:
+    """
+    Task store in one SQLite file (WAL mode), so every gunicorn worker and any
+    container sharing the volume sees the same tasks without sticky routing.
+    Updates are a single UPDATE … json_set(…) statement: atomic, no
+    read-modify-write, and they bump a version column listeners can watch.
+    """
 
-        # ── Prepare yt-dlp options for fallback (metadata & chapters) ──
-        info_opts = {
-            'quiet':             True,
-            'geo_bypass':        True,
-            'nocheckcertificate':True,
-            'http_headers':      COMMON_HEADERS,
-            'downloader':        'curl_cffi',
-            'extractor_args':    {'youtube': extractor_args},
-            'cookiefile':        COOKIE_FILE,
-        }
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS tasks (
+            id         TEXT PRIMARY KEY,
+            data       TEXT NOT NULL,
+            version    INTEGER NOT NULL DEFAULT 1,
+            expires_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS tasks_expires ON tasks (expires_at);
+        CREATE TABLE IF NOT EXISTS claims (
+            key        TEXT PRIMARY KEY,
+            task_id    TEXT NOT NULL,
+            expires_at REAL NOT NULL,
+            owner      TEXT NOT NULL DEFAULT ''
+        );
+        CREATE INDEX IF NOT EXISTS claims_task ON claims (task_id);
+    """
 
-        vid = extract_video_id(youtube_url)
+    def __init__(self, path: str = TASK_DB, ttl: float = TASK_TTL):
+        self.path   = path
+        self.ttl    = ttl
+        self._local = threading.local()
+
+    def _conn(self):
+        # opened (and the schema ensured) on first use in each thread, so
+        # importing the app never touches the disk
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(self.SCHEMA)
+            if "owner" not in [col[1] for col in conn.execute("PRAGMA table_info(claims)")]:
+                try:                          # file from before claims had owners
+                    conn.execute("ALTER TABLE claims ADD COLUMN owner TEXT NOT NULL DEFAULT ''")
+                except sqlite3.OperationalError:
+                    pass                      # another worker added it first
+            self._local.conn = conn
+        return conn
+
+    def create(self, task_id, fields: dict):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO tasks (id, data, version, expires_at) VALUES (?, ?, 1, ?)",
+            (task_id, json.dumps(fields), time.time() + self.ttl),
+        )
 
-        # 2) METADATA: Data API first, fallback for title & chapters
-        
-        # after: two distinct phases
-        # 1) Data API → title + (maybe) chapters
+    def get(self, task_id):
+        row = self._conn().execute(
+            "SELECT data FROM tasks WHERE id = ? AND expires_at >= ?", (task_id, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def update(self, task_id, fields: dict):
+        paths, args = [], []
+        for key, value in fields.items():
+            paths.append("?, json(?)")
+            args += ['$."' + key.replace('"', '') + '"', json.dumps(value)]
+        conn = self._conn()
+        cur = conn.execute(
+            f"UPDATE tasks SET data = json_set(data, {', '.join(paths)}), "
+            f"version = version + 1, expires_at = ? WHERE id = ?",
+            (*args, time.time() + self.ttl, task_id),
+        )
+        if cur.rowcount == 0:
+            return None
+        return self.version(task_id)
+
+    def version(self, task_id) -> int:
+        row = self._conn().execute("SELECT version FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        return row[0] if row else 0
+
+    def versions(self, task_ids) -> dict:
+        """version() for many tasks in a few queries (chunks stay under SQLite's variable limit)."""
+        task_ids = list(task_ids)
+        out = dict.fromkeys(task_ids, 0)
+        for i in range(0, len(task_ids), 500):
+            chunk = task_ids[i:i + 500]
+            out.update(self._conn().execute(
+                f"SELECT id, version FROM tasks WHERE id IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall())
+        return out
+
+    def delete(self, task_id):
+        self._conn().execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+
+    def claim(self, key, task_id, ttl: float = JOB_CLAIM_TTL):
+        """Makes `task_id` the job for `key` unless a live task holds it; returns the holder."""
+        conn, now = self._conn(), time.time()
+        conn.execute("BEGIN IMMEDIATE")       # one claimant at a time across workers
         try:
-            meta     = get_video_metadata(vid)
-            title    = meta["title"]
-            chapters = parse_chapters(meta["description"])
-        except Exception as e:
-            app.logger.warning(f"Data API failed ({e}); falling back to yt-dlp for metadata")
-            with YoutubeDL(info_opts) as ydl:
-                info = ydl.extract_info(youtube_url, download=False)
-            title    = info.get("title", youtube_url)
-            chapters = info.get("chapters") or []
-
-        # 2) If Data API gave no chapters, try *only* for chapters
-        if not chapters:
-            try:
-                app.logger.info("No description-chapters; falling back to yt-dlp for chapters")
-                with YoutubeDL(info_opts) as ydl:
-                    info_meta = ydl.extract_info(youtube_url, download=False)
-                chapters = info_meta.get("chapters") or []
-            except Exception as e:
-                app.logger.warning(f"Chapter extraction via yt-dlp failed ({e}); proceeding without chapters")
-                chapters = []
+            row = conn.execute(
+                "SELECT c.task_id, c.expires_at, c.owner FROM claims c JOIN tasks t ON t.id = c.task_id "
+                "WHERE c.key = ? AND t.expires_at >= ? "
+                "AND json_extract(t.data, '$.status') NOT IN ('done', 'error')",
+                (key, now),
+            ).fetchone()
+            if row and (row[1] < now or not owner_alive(row[2])):
+                self._orphan(row[0])
+                row = None
+            if row is None:
+                conn.execute("INSERT OR REPLACE INTO claims (key, task_id, expires_at, owner) "
+                             "VALUES (?, ?, ?, ?)", (key, task_id, now + ttl, worker_id()))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return row[0] if row else task_id
+
+    def renew(self, task_ids, ttl: float = JOB_CLAIM_TTL):
+        """Heartbeat: extends the claims held by these tasks."""
+        task_ids = list(task_ids)
+        for i in range(0, len(task_ids), 500):
+            chunk = task_ids[i:i + 500]
+            self._conn().execute(
+                f"UPDATE claims SET expires_at = ? WHERE task_id IN ({','.join('?' * len(chunk))})",
+                (time.time() + ttl, *chunk),
+            )
 
+    def release(self, key, task_id):
+        self._conn().execute("DELETE FROM claims WHERE key = ? AND task_id = ?", (key, task_id))
 
-        # ── NEW: Compute end_time for each chapter ─────────
-        if 'meta' in locals():
-            # Data API path
-            duration_secs = int(parse_duration(meta['duration']).total_seconds())
-        else:
-            # yt-dlp fallback path
-            duration_secs = int(info.get('duration', 0))
+    def _orphan(self, task_id):
+        self._conn().execute(
+            "UPDATE tasks SET data = json_set(data, '$.status', 'error', '$.error', ?, "
+            "'$.queue_position', json('null')), version = version + 1 "
+            "WHERE id = ? AND json_extract(data, '$.status') NOT IN ('done', 'error')",
+            (ORPHANED_JOB_ERROR, task_id),
+        )
 
+    def expire(self) -> int:
+        conn, now = self._conn(), time.time()
+        for key, task_id, expires_at, owner in conn.execute(
+                "SELECT key, task_id, expires_at, owner FROM claims").fetchall():
+            if expires_at < now or not owner_alive(owner):
+                self._orphan(task_id)
+                conn.execute("DELETE FROM claims WHERE key = ? AND task_id = ?", (key, task_id))
+        return conn.execute("DELETE FROM tasks WHERE expires_at < ?", (now,)).rowcount
+
+def make_task_store():
+    if TASK_STORE == "memory":
+        return MemoryTaskStore()
+    return SQLiteTaskStore()
+
+TASKS = make_task_store()
+
+# Progress change notification for /events: updates made in this process wake
+# that task's listeners at once; other workers' updates are seen by polling
+# the store's version every SSE_POLL_SECS
+_task_lock        = threading.Lock()
+_task_conds       = {}
+_last_write       = {}                   # task_id → (monotonic time, status) of last write
+_last_expire      = 0.0
+
+def create_task(task_id, **fields):
+    """Registers a new task (and now and then drops expired ones)."""
+    global _last_expire
+    TASKS.create(task_id, fields)
+    if time.monotonic() - _last_expire > 60:
+        _last_expire = time.monotonic()
+        TASKS.expire()
+        with _task_lock:
+            for tid in [t for t in _last_write if TASKS.version(t) == 0]:
+                _last_write.pop(tid, None)
+                _task_conds.pop(tid, None)
+
+def update_task(task_id, **fields):
+    """Applies a progress/status update and wakes anyone streaming this task."""
+    # percent-only ticks (download hooks fire per chunk) are coalesced
+    now = time.monotonic()
+    with _task_lock:
+        last = _last_write.get(task_id)
+        if (last and set(fields) <= {"status", "percent"} and fields.get("status", last[1]) == last[1]
+                and now - last[0] < PROGRESS_WRITE_INTERVAL):
+            return
+        _last_write[task_id] = (now, fields.get("status", last[1] if last else None))
+
+    if TASKS.update(task_id, fields) is None:
+        return
+    with _task_lock:
+        cond = _task_conds.get(task_id)
+        if cond:
+            cond.notify_all()
+
+def wait_for_task_change(task_id, seen_version: int, timeout: float) -> int:
+    """Blocks until the task's version differs from `seen_version` (or timeout)."""
+    deadline = time.monotonic() + timeout
+    while True:
+        version = TASKS.version(task_id)
+        left = deadline - time.monotonic()
+        if version != seen_version or left <= 0:
+            return version
+        with _task_lock:
+            cond = _task_conds.setdefault(task_id, threading.Condition(_task_lock))
+            cond.wait(min(left, SSE_POLL_SECS))
+
+def task_status(task_id):
+    """The /status payload (queue_position is kept current by the scheduler)."""
+    return TASKS.get(task_id) or {'status':'not found'}
+
+class QueueFull(Exception):
+    """Raised by JobScheduler.submit when MAX_QUEUE jobs are already waiting."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Job queue is full; retry in {retry_after}s")
+        self.retry_after = retry_after
+
+class JobScheduler:
+    """
+    Bounded worker pool in front of background_task.
+    Jobs wait in a priority queue (lower number first, FIFO within a
+    priority) until one of `workers` threads is free; submit() refuses new
+    jobs once `max_queue` are waiting. shutdown() stops intake and drains.
+    """
 
-        # then build end_time off duration_secs instead of meta['duration']
-        for idx, ch in enumerate(chapters):
-            if idx < len(chapters) - 1:
-                ch['end_time'] = chapters[idx+1]['start_time']
-            else:
-                ch['end_time'] = duration_secs
+    def __init__(self, workers: int, max_queue: int):
+        self.workers   = workers
+        self.max_queue = max_queue
+        self._heap     = []                  # (priority, seq, task_id, fn, args)
+        self._seq      = 0
+        self._running  = set()
+        self._threads  = []
+        self._closed   = False
+        self._avg_secs = None                # EWMA of job run time for Retry-After
+        self._beat     = None                # claim heartbeat thread, started with the first job
+        self._cond     = threading.Condition()
+
+    def submit(self, task_id, fn, *args, priority: int = 0) -> int:
+        """Queues fn(task_id, *args); returns the job's 1-based queue position."""
+        with self._cond:
+            if self._closed:
+                raise QueueFull(self.retry_after())
+            if len(self._heap) >= self.max_queue:
+                raise QueueFull(self.retry_after())
+            self._seq += 1
+            heapq.heappush(self._heap, (priority, self._seq, task_id, fn, args))
+            if len(self._threads) < self.workers:
+                t = threading.Thread(target=self._work, name=f"job-worker-{len(self._threads)}", daemon=True)
+                self._threads.append(t)
+                t.start()
+            self._start_heartbeat_locked()
+            # written under the lock, so a worker that pops the job right away
+            # can't have its queue_position=None overwritten by this one
+            position = self._position_locked(task_id)
+            update_task(task_id, queue_position=position)
+            self._cond.notify()
+        return position
+
+    def submit_many(self, jobs, priority: int = 0) -> list:
+        """
+        Queues [(task_id, fn, args), ...] all-or-nothing: raises QueueFull
+        unless every job fits. Returns their queue positions.
+        """
+        with self._cond:
+            if self._closed or len(self._heap) + len(jobs) > self.max_queue:
+                raise QueueFull(self.retry_after())
+            for task_id, fn, args in jobs:
+                self._seq += 1
+                heapq.heappush(self._heap, (priority, self._seq, task_id, fn, args))
+            while len(self._threads) < min(self.workers, len(self._heap) + len(self._running)):
+                t = threading.Thread(target=self._work, name=f"job-worker-{len(self._threads)}", daemon=True)
+                self._threads.append(t)
+                t.start()
+            self._start_heartbeat_locked()
+            positions = [self._position_locked(task_id) for task_id, _, _ in jobs]
+            for (task_id, _, _), position in zip(jobs, positions):
+                update_task(task_id, queue_position=position)
+            self._cond.notify_all()
+        return positions
+
+    def position(self, task_id):
+        """1-based place in the queue, or None once the job has started."""
+        with self._cond:
+            return self._position_locked(task_id)
+
+    def _position_locked(self, task_id):
+        for pos, job in enumerate(sorted(self._heap), start=1):
+            if job[2] == task_id:
+                return pos
+        return None
+
+    def retry_after(self) -> int:
+        """Rough seconds until a queue slot frees up."""
+        per_job = self._avg_secs or 30
+        return max(1, int(per_job * max(len(self._heap), 1) / max(self.workers, 1)))
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "queued":    len(self._heap),
+                "running":   len(self._running),
+                "workers":   self.workers,
+                "max_queue": self.max_queue,
+                "avg_job_s": round(self._avg_secs, 2) if self._avg_secs else None,
+                "closed":    self._closed,
+            }
 
-        # ─────────────────────────────────────────────────────
+    def _start_heartbeat_locked(self):
+        if self._beat is None:
+            self._beat = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+            self._beat.start()
+
+    def _heartbeat(self):
+        """Renews the claims of this process's queued and running jobs (see JOB_CLAIM_TTL)."""
+        while True:
+            with self._cond:
+                task_ids = [job[2] for job in self._heap] + list(self._running)
+            if task_ids:
+                try:
+                    TASKS.renew(task_ids)
+                except Exception:
+                    logging.exception("Job claim heartbeat failed")
+            time.sleep(JOB_HEARTBEAT_SECS)
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._heap and not self._closed:
+                    self._cond.wait()
+                if not self._heap:
+                    return
+                _, _, task_id, fn, args = heapq.heappop(self._heap)
+                self._running.add(task_id)
+
+                # this job has left the queue, and everyone behind it moved up
+                # one place; positions are only ever written under the lock
+                update_task(task_id, queue_position=None)
+                for pos, job in enumerate(sorted(self._heap), start=1):
+                    update_task(job[2], queue_position=pos)
+
+            t0 = time.monotonic()
+            try:
+                fn(task_id, *args)
+            except Exception:
+                logging.exception(f"Job {task_id} crashed")
+            finally:
+                secs = time.monotonic() - t0
+                with self._cond:
+                    self._running.discard(task_id)
+                    self._avg_secs = secs if self._avg_secs is None else 0.8 * self._avg_secs + 0.2 * secs
+                    self._cond.notify_all()
+
+    def shutdown(self, timeout: float = None):
+        """Stops accepting jobs and waits for queued and running ones to finish."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while self._heap or self._running:
+                left = None if deadline is None else deadline - time.monotonic()
+                if left is not None and left <= 0:
+                    app.logger.warning(f"Scheduler shutdown timed out with {len(self._heap)} queued, "
+                                       f"{len(self._running)} running")
+                    return
+                self._cond.wait(left)
+
+SCHEDULER = JobScheduler(MAX_WORKERS, MAX_QUEUE)
+atexit.register(SCHEDULER.shutdown)
+
+# Stage limits shared by every job (acquire NET before CPU when holding both)
+NET_STAGE = threading.BoundedSemaphore(NET_SLOTS)
+CPU_STAGE = threading.BoundedSemaphore(CPU_SLOTS)
+
+def background_task(task_id, youtube_url, out_format=DEFAULT_OUTPUT_FORMAT, meta=None):
+    from yt_dlp import YoutubeDL
+    from yt_dlp.utils import DownloadError
+    from yt_dlp.version import __version__ as ytdlp_version
+
+    # 0) Log version
+    app.logger.info(f"▶ yt-dlp version: {ytdlp_version}")
+    update_task(task_id, status='starting')
+    start_time = time.time()
+    fmt_spec   = OUTPUT_FORMATS[out_format]
+    out_ext    = fmt_spec["ext"]
+    folder     = None
+    parallel_mp3 = False
 
-        # 3) Prepare download folder
-        folder = get_download_folder(title)
+    try:
+        vid = extract_video_id(youtube_url)
 
-        # ◀─ clear out any existing files so we don’t get duplicates
-        for existing in os.listdir(folder):
-            path = os.path.join(folder, existing)
-            if os.path.isfile(path):
-                os.remove(path)
+        # 2) METADATA: shared, cached resolution (Data API, then yt-dlp if needed);
+        #    /start hands over the Data API result it already fetched
+        with NET_STAGE, stage_timer("metadata"):
+            video = resolve_video(vid, youtube_url, meta=meta)
+        title         = video["title"]
+        chapters      = video["chapters"]
+
+        # 3) Result cache: identical video + settings + chapters → reuse output
+        cache_key = result_cache_key(vid, out_format, chapters)
+        cached = cache_lookup(cache_key)
+        if cached:
+            app.logger.info(f"▶ Result cache hit for {vid} ({cache_key})")
+            elapsed = time.time() - start_time
+            update_task(task_id, status='done', percent=100,
+                                  result=dict(cached, cached=True, total_time=f"{elapsed:.2f}"))
+            return
+
+        # 3.1) Cookies only matter for the download: refresh them after a cache
+        #      miss, then a session with a private copy of the in-memory cookies
+        #      + your standard headers, on the connection pools shared by all jobs
+        with NET_STAGE:
+            maybe_refresh_cookies(youtube_url)
+        session = http_session(COOKIES.jar())
+
+        # yt-dlp extractor args (fallback download only)
+        extractor_args = YTDLP_EXTRACTOR_ARGS
+
+        # 3.2) Private scratch dir: concurrent jobs never share files, and the
+        #      output only appears under downloads/<cache_key> once complete
+        folder = make_scratch_dir(task_id)
 
         # ── NEW: progress hook for yt-dlp fallback ──
         def dl_hook(d):
             if d.get('status') == 'downloading' and d.get('total_bytes'):
                 # approximate percent: 5–50% of overall task
                 pct = d['downloaded_bytes'] / d['total_bytes'] * 45 + 5
-                tasks[task_id].update(status='downloading', percent=pct)
+                update_task(task_id, status='downloading', percent=pct)
 
         # 4) DOWNLOAD VIA INNERTUBE PLAYER API ──────────────
         # 4.1) Fetch signed URLs
@@ -312,8 +2519,9 @@ def background_task(task_id, youtube_url):
                 }
             }
         }
-        player_url = f"https://www.youtube.com/youtubei/v1/player?key={YOUTUBE_API_KEY}"
-        resp = session.post(player_url, json=payload)
+        player_url = f"{YOUTUBE_PLAYER_URL}?key={YOUTUBE_API_KEY}" if YOUTUBE_API_KEY else YOUTUBE_PLAYER_URL
+        with NET_STAGE, stage_timer("player_api"):
+            resp = session.post(player_url, json=payload)
         resp.raise_for_status()
         streaming  = resp.json().get("streamingData", {})
 
@@ -328,6 +2536,9 @@ def background_task(task_id, youtube_url):
             mt = fmt.get("mimeType", "")
             if not mt.startswith("audio/"):
                 continue
+            # passthrough formats can only use the matching container
+            if fmt_spec["mime"] and not mt.startswith(fmt_spec["mime"]):
+                continue
 
             # 1) direct URL?
             url = fmt.get("url")
@@ -350,132 +2561,211 @@ def background_task(task_id, youtube_url):
             
             # ── FALLBACK yt-dlp DOWNLOAD OPTIONS ──
             # (used only if Innertube yields no audio URLs)
+            # passthrough formats ask for the matching container so
+            # FFmpegExtractAudio only has to remux, never re-encode
+            if out_format == 'mp3':
+                ydl_format = 'bestaudio[ext=m4a]/bestaudio/best'
+            elif out_format == 'm4a':
+                ydl_format = 'bestaudio[ext=m4a]/bestaudio'
+            else:
+                ydl_format = 'bestaudio[ext=webm]/bestaudio'
+            postprocessor = {
+                'key':             'FFmpegExtractAudio',
+                'preferredcodec':  out_format,
+            }
+            if out_format == 'mp3':
+                postprocessor['preferredquality'] = MP3_BITRATE.rstrip('k')
+
             ydl_opts = {
-                'format':               'bestaudio[ext=m4a]/bestaudio/best',
+                'format':               ydl_format,
                 'progress_hooks':       [dl_hook],
                 'outtmpl':              os.path.join(folder, 'full_audio.%(ext)s'),
-                'postprocessors':       [{
-                    'key':             'FFmpegExtractAudio',
-                    'preferredcodec':  'mp3',
-                    'preferredquality':'192'
-                }],
+                'postprocessors':       [postprocessor],
                 'geo_bypass':           True,
                 'nocheckcertificate':   True,
                 'http_headers':         COMMON_HEADERS,
                 'downloader': 'curl_cffi',
                 'extractor_args':       {'youtube': extractor_args},
                 'cookiefile':           COOKIE_FILE,
-                'ratelimit':            1_000_000,
-                'sleep_interval_requests': 1.0,
+                **GOVERNOR.ytdlp_pacing(),      # ratelimit + sleep_interval_requests
                 'retries':              3,
                 'http_chunk_size': 100 * 1024 * 1024,  # 100 MB chunks → far fewer range requests
             }
             anon_opts = {k: v for k, v in ydl_opts.items() if k != 'cookiefile'}
             anon_opts['nocookies'] = True
 
-            try:
-                with YoutubeDL(ydl_opts) as ydl:
-                    ydl.download([youtube_url])
-            except DownloadError:
-                app.logger.warning("⚠️ ffmpeg failed; falling back to curl_cffi downloader")
-                # Copy the same options but remove any ffmpeg hooks
-                fallback_opts = ydl_opts.copy()
-                fallback_opts['downloader'] = 'curl_cffi'
-                fallback_opts.pop('external_downloader', None)
-                fallback_opts.pop('external_downloader_args', None)
-                with YoutubeDL(fallback_opts) as ydl_fallback:
-                    ydl_fallback.download([youtube_url])
-
-            full_mp3 = os.path.join(folder, "full_audio.mp3")
+            # yt-dlp downloads and then runs ffmpeg: hold both stage slots
+            with NET_STAGE, CPU_STAGE, stage_timer("download"):
+                try:
+                    with YoutubeDL(ydl_opts) as ydl:
+                        ydl.download([youtube_url])
+                except DownloadError:
+                    app.logger.warning("⚠️ ffmpeg failed; falling back to curl_cffi downloader")
+                    # Copy the same options but remove any ffmpeg hooks
+                    fallback_opts = ydl_opts.copy()
+                    fallback_opts['downloader'] = 'curl_cffi'
+                    fallback_opts.pop('external_downloader', None)
+                    fallback_opts.pop('external_downloader_args', None)
+                    with YoutubeDL(fallback_opts) as ydl_fallback:
+                        ydl_fallback.download([youtube_url])
+
+            full_audio = os.path.join(folder, f"full_audio.{out_ext}")
         else:
             # ── INNERTUBE PATH ── pick best bitrate
             best = max(audio_fmts, key=lambda f: f.get("bitrate", 0))
             audio_url = best["url"]
-
-            # 4.3) Download .m4a via requests
-            m4a_path = os.path.join(folder, "full_audio.m4a")
-            with session.get(audio_url, stream=True) as r:
-                r.raise_for_status()
-                with open(m4a_path, "wb") as out:
-                    for chunk in r.iter_content(1024*1024):
-                        out.write(chunk)
-            tasks[task_id].update(status="downloaded", percent=50)
-
-            # 4.4) Convert .m4a → .mp3
-            mp3_path = os.path.join(folder, "full_audio.mp3")
-            subprocess.run([
-                "ffmpeg", "-y", "-i", m4a_path,
-                "-vn", "-codec:a", "libmp3lame", "-b:a", "192k",
-                mp3_path
-            ], check=True)
-            os.remove(m4a_path)
-            full_mp3 = mp3_path
-
-
-        # 5) SPLIT INTO CHAPTERS
-        files = []
-        for i, ch in enumerate(chapters):
-            start = ch['start_time']
-            end   = ch['end_time']
-            safe  = sanitize_filename(ch['title'])
-            part  = f"{safe}.mp3"
-            part_path = os.path.join(folder, part)
-
-            subprocess.run([
-                "ffmpeg", "-y", "-i", full_mp3,
-                "-ss", str(start),
-                "-to", str(end),
-                "-c", "copy", part_path
-            ], check=True)
-
-            files.append(part)
-            pct = 50 + ((i+1)/len(chapters))*45
-            tasks[task_id].update(status='splitting', percent=pct)
+            src_ext   = SOURCE_EXTS.get(best["mimeType"].split(";")[0], "m4a")
+            src_bytes = int(best.get("contentLength") or 0)
+
+            if PIPELINE_MODE == "stream":
+                # 4.3+4.4) Stream: bytes go straight from the socket into ffmpeg,
+                # which encodes (mp3) or copies and cuts chapters as they arrive
+                def stream_hook(received, total):
+                    if total:
+                        pct = 5 + min(received / total, 1) * 90
+                        update_task(task_id, status='downloading', percent=pct)
+
+                codec_args = (["-c:a", "libmp3lame", "-b:a", MP3_BITRATE]
+                              if out_format == 'mp3' else None)
+                feed  = iter_download(session, audio_url, total=src_bytes, on_progress=stream_hook)
+                if (out_format == 'mp3' and CHAPTER_SLICES) or (not chapters and AUTO_CHAPTERS):
+                    # one file: chapters become slices of it, or are found in it, below
+                    full_audio = os.path.join(folder, f"full_audio.{out_ext}")
+                    with NET_STAGE, CPU_STAGE, stage_timer("stream"):
+                        encode_audio(None, full_audio, codec_args or ["-c", "copy"], feed=feed)
+                else:
+                    with NET_STAGE, CPU_STAGE, stage_timer("stream"):
+                        files = split_chapters(None, chapters, folder, ext=out_ext,
+                                               codec_args=codec_args, feed=feed)
+                    full_audio = None
+            else:
+                # 4.3) Download the source container as parallel byte ranges
+                def file_hook(received, total):
+                    if total:
+                        pct = 5 + min(received / total, 1) * 45
+                        update_task(task_id, status='downloading', percent=pct)
+
+                src_path = os.path.join(folder, f"full_audio.{src_ext}")
+                with NET_STAGE, stage_timer("download"):
+                    download_ranged(session, audio_url, src_path, total=src_bytes, on_progress=file_hook)
+                update_task(task_id, status="downloaded", percent=50)
+
+                if out_format == 'mp3' and MP3_ENCODE == "parallel":
+                    # 4.4) Chapters are encoded straight from the source in step 5
+                    full_audio, parallel_mp3 = src_path, True
+                elif out_format == 'mp3':
+                    # 4.4) Convert source → .mp3
+                    mp3_path = os.path.join(folder, "full_audio.mp3")
+                    with CPU_STAGE, stage_timer("transcode"):
+                        subprocess.run([
+                            "ffmpeg", "-y", "-i", src_path,
+                            "-vn", "-codec:a", "libmp3lame", "-b:a", MP3_BITRATE,
+                            mp3_path
+                        ], check=True)
+                    os.remove(src_path)
+                    full_audio = mp3_path
+                else:
+                    # 4.4) Passthrough: chapters are stream-copied from the source
+                    full_audio = src_path
+
+
+        # 5) SPLIT INTO CHAPTERS (one ffmpeg pass for all of them)
+        def split_hook(done, total):
+            pct = 50 + (done/total)*45
+            update_task(task_id, status='splitting', percent=pct)
+
+        # 4.5) No chapters anywhere: cut at silences in the audio itself
+        auto_chapters = bool(full_audio and not chapters and AUTO_CHAPTERS)
+        if auto_chapters:
+            update_task(task_id, status='detecting chapters', percent=50)
+            with CPU_STAGE, stage_timer("silence"):
+                chapters = silence_chapters(full_audio)
+            app.logger.info(f"▶ Auto-chaptered {vid} into {len(chapters)} parts at silences")
+
+        slices = None
+        if full_audio and parallel_mp3:
+            # 5) MP3, parallel: decode once, encode every chapter on its own core
+            with stage_timer("transcode"):
+                files = encode_chapters(full_audio, chapters, folder, on_progress=split_hook)
+        elif full_audio and out_format == 'mp3' and CHAPTER_SLICES:
+            # 5) MP3: index frames once; chapters are served as byte slices
+            update_task(task_id, status='splitting', percent=95)
+            with stage_timer("split"):
+                files, slices = slice_chapters(full_audio, chapters, folder)
+        elif full_audio:
+            with CPU_STAGE, stage_timer("split"):
+                files = split_chapters(full_audio, chapters, folder, ext=out_ext, on_progress=split_hook)
 
         # 6) FINISH
-        # ── CLEAN UP: remove the master MP3 so get_folder_size_mb only sums the chapters ──
-        full_audio_path = os.path.join(folder, 'full_audio.mp3')
-        if os.path.exists(full_audio_path):
-            os.remove(full_audio_path)
+        # ── CLEAN UP: remove the master file so get_folder_size_mb only sums the chapters ──
+        for existing in os.listdir(folder):
+            if existing.startswith('full_audio.'):
+                os.remove(os.path.join(folder, existing))
 
         elapsed = time.time() - start_time
-        tasks[task_id].update(
-            status='done', percent=100,
-            result={
-                'video_title': title,
-                'path':        os.path.basename(folder),
-                'total_time':  f"{elapsed:.2f}",
-                'total_space': f"{get_folder_size_mb(folder):.2f}",
-                'files':       files
-            }
-        )
+        result = {
+            'video_title': title,
+            'path':        cache_key,
+            'total_time':  f"{elapsed:.2f}",
+            'total_space': f"{get_folder_size_mb(folder):.2f}",
+            'format':      out_format,
+            'codec':       fmt_spec["codec"],
+            'files':       files,
+            'cached':      False,
+        }
+        if slices:
+            result.update(source=MP3_SOURCE_NAME, slices=slices)
+        if auto_chapters:
+            result['auto_chapters'] = True
+        cache_store(cache_key, result, scratch=folder)
+        folder = None                          # published; nothing left to clean up
+        update_task(task_id, status='done', percent=100, result=result)
 
     except Exception as e:
         logging.exception("Task failed")
-        tasks[task_id].update(status='error', error=str(e))
+        update_task(task_id, status='error', error=str(e))
+    finally:
+        # ◀─ don't leave half-built output behind; let the next submitter start afresh
+        if folder:
+            shutil.rmtree(folder, ignore_errors=True)
+        TASKS.release(job_key(extract_video_id(youtube_url), out_format), task_id)
 
 
 # ───────────────────────────────────────────────────────────────────────────────
 # ROUTES (unchanged)
 # ───────────────────────────────────────────────────────────────────────────────
 
-@app.route('/start', methods=['POST'])
+routes = Blueprint("routes", __name__)
+
+YOUTUBE_URL_RE  = re.compile(r'^(https?://)?(www\.)?(youtube\.com/watch\?v=|youtu\.be/)[\w-]{11}')
+PLAYLIST_ID_RE  = re.compile(r'^[\w-]{10,64}$')
+
+def cached_result(vid, out_format, meta, duration_secs):
+    """A finished result for this video/format if description chapters hit the cache."""
+    chapters = add_end_times(parse_chapters(meta['description']), duration_secs)
+    return chapters and cache_lookup(result_cache_key(vid, out_format, chapters),
+                                     record_miss=False)
+
+@routes.route('/start', methods=['POST'])
 def start():
     data = request.get_json(force=True)
     url  = data.get('youtube_url','').strip()
-    if not re.match(r'^(https?://)?(www\.)?(youtube\.com/watch\?v=|youtu\.be/)[\w-]{11}', url):
+    if not YOUTUBE_URL_RE.match(url):
         return jsonify(error="Invalid YouTube URL."), 400
+    out_format = (data.get('format') or DEFAULT_OUTPUT_FORMAT).lower()
+    if out_format not in OUTPUT_FORMATS:
+        return jsonify(error=f"Unsupported format. Choose one of: {', '.join(OUTPUT_FORMATS)}."), 400
 
     # ─── New: enforce max video length ────────────────────────────────────────
     vid = extract_video_id(url)
+    meta = None
     try:
         # Try Data API first
         meta = get_video_metadata(vid)
         duration_secs = int(parse_duration(meta['duration']).total_seconds())
     except Exception:
-        # Fallback to yt-dlp if Data API fails
-        with YoutubeDL({'quiet': True}) as ydl:
-            info = ydl.extract_info(url, download=False)
+        # Fallback to yt-dlp if Data API fails (cached, so the task reuses it)
+        info = get_ytdlp_info(url)
         duration_secs = info.get('duration', 0) or 0
 
     if duration_secs > MAX_VIDEO_LENGTH_SECS:
@@ -483,20 +2773,222 @@ def start():
             error="Video is too long. Maximum allowed length is 1 hour 30 minutes."
         ), 400
     # ────────────────────────────────────────────────────────────────────────────
-    
+
     tid = str(uuid.uuid4())
-    tasks[tid] = {'status':'queued','percent':0}
-    threading.Thread(target=background_task, args=(tid,url), daemon=True).start()
-    return jsonify(task_id=tid), 202
 
-@app.route('/status/<task_id>', methods=['GET'])
+    # ─── Result cache: description chapters are enough to build the key ──────
+    if meta is not None:
+        cached = cached_result(vid, out_format, meta, duration_secs)
+        if cached:
+            create_task(tid, status='done', percent=100,
+                        result=dict(cached, cached=True, total_time="0.00"))
+            return jsonify(task_id=tid), 202
+
+    # ─── Same video & format already queued or running: share that job ──────
+    create_task(tid, status='queued', percent=0)
+    owner = TASKS.claim(job_key(vid, out_format), tid)
+    if owner != tid:
+        TASKS.delete(tid)
+        return jsonify(task_id=owner, coalesced=True), 202
+
+    try:
+        position = SCHEDULER.submit(tid, background_task, url, out_format, meta)
+    except QueueFull as e:
+        TASKS.delete(tid)
+        TASKS.release(job_key(vid, out_format), tid)
+        resp = jsonify(error="Server is busy. Please try again shortly.")
+        resp.headers['Retry-After'] = str(e.retry_after)
+        return resp, 429
+    return jsonify(task_id=tid, queue_position=position), 202
+
+# ── Batch: many URLs and/or a playlist, one handle for all of them ──
+@routes.route('/batch', methods=['POST'])
+def start_batch():
+    data = request.get_json(force=True)
+    out_format = (data.get('format') or DEFAULT_OUTPUT_FORMAT).lower()
+    if out_format not in OUTPUT_FORMATS:
+        return jsonify(error=f"Unsupported format. Choose one of: {', '.join(OUTPUT_FORMATS)}."), 400
+
+    urls = data.get('youtube_urls') or []
+    if not isinstance(urls, list):
+        return jsonify(error="youtube_urls must be a list."), 400
+    video_ids = []
+    for url in urls:
+        url = str(url).strip()
+        if not YOUTUBE_URL_RE.match(url):
+            return jsonify(error=f"Invalid YouTube URL: {url}"), 400
+        video_ids.append(extract_video_id(url))
+
+    playlist = (data.get('playlist') or '').strip()
+    if playlist:
+        playlist = parse_qs(urlparse(playlist).query).get('list', [playlist])[0]
+        if not PLAYLIST_ID_RE.match(playlist):
+            return jsonify(error="Invalid playlist ID."), 400
+        try:
+            playlist_ids, playlist_total = fetch_playlist_video_ids(playlist)
+        except Exception as e:
+            app.logger.warning(f"Playlist lookup failed for {playlist}: {e}")
+            return jsonify(error="Could not read that playlist."), 400
+        if len(playlist_ids) > BATCH_MAX_VIDEOS:
+            return jsonify(error=f"The playlist has {playlist_total} videos; the limit is "
+                                 f"{BATCH_MAX_VIDEOS} per batch.", total=playlist_total), 400
+        video_ids += playlist_ids
+
+    video_ids = list(dict.fromkeys(video_ids))          # dedupe, keep order
+    if not video_ids:
+        return jsonify(error="No videos given."), 400
+    if len(video_ids) > BATCH_MAX_VIDEOS:
+        return jsonify(error=f"Too many videos; the limit is {BATCH_MAX_VIDEOS} per batch.",
+                       total=len(video_ids)), 400
+
+    try:
+        metas = get_videos_metadata(video_ids)
+    except Exception as e:
+        app.logger.warning(f"Batch metadata lookup failed: {e}")
+        return jsonify(error="Could not look up the videos. Please try again shortly."), 503
+
+    # Length-check everything up front; unusable videos are reported, not queued
+    items, jobs = [], []
+    for vid in video_ids:
+        item = {'video_id': vid}
+        items.append(item)
+        meta = metas.get(vid)
+        if meta is None:
+            item['error'] = "Video not found or not available."
+            continue
+        duration_secs = int(parse_duration(meta['duration']).total_seconds())
+        if duration_secs > MAX_VIDEO_LENGTH_SECS:
+            item['error'] = "Video is too long. Maximum allowed length is 1 hour 30 minutes."
+            continue
+        item['task_id'] = tid = str(uuid.uuid4())
+        cached = cached_result(vid, out_format, meta, duration_secs)
+        if cached:
+            create_task(tid, status='done', percent=100,
+                        result=dict(cached, cached=True, total_time="0.00"))
+            continue
+        create_task(tid, status='queued', percent=0)
+        owner = TASKS.claim(job_key(vid, out_format), tid)
+        if owner != tid:
+            TASKS.delete(tid)
+            item.update(task_id=owner, coalesced=True)
+            continue
+        jobs.append((tid, background_task,
+                     (f"https://www.youtube.com/watch?v={vid}", out_format, meta)))
+
+    if not any('task_id' in item for item in items):
+        return jsonify(error="None of the videos can be processed.", items=items), 400
+
+    try:
+        SCHEDULER.submit_many(jobs, priority=BATCH_PRIORITY)
+    except QueueFull as e:
+        for tid, _, args in jobs:
+            TASKS.delete(tid)
+            TASKS.release(job_key(extract_video_id(args[0]), out_format), tid)
+        resp = jsonify(error="Server is busy. Please try again shortly.")
+        resp.headers['Retry-After'] = str(e.retry_after)
+        return resp, 429
+
+    bid = str(uuid.uuid4())
+    create_task(bid, status='batch', format=out_format, items=items)
+    return jsonify(batch_id=bid, items=items), 202
+
+def batch_status(batch_id):
+    """Combined progress of a batch plus each video's status (and result once done)."""
+    batch = TASKS.get(batch_id)
+    if not batch or batch.get('status') != 'batch':
+        return None
+    items, counts, percent = [], {'done': 0, 'error': 0}, 0
+    for item in batch['items']:
+        item = dict(item)
+        if 'task_id' in item:
+            t = task_status(item['task_id'])
+            item.update(status=t['status'], percent=t.get('percent', 0))
+            for key in ('result', 'error', 'queue_position'):
+                if t.get(key) is not None:
+                    item[key] = t[key]
+            if t['status'] == 'not found':
+                item['status'] = 'error'
+        else:
+            item.update(status='error', percent=100)
+        if item['status'] in counts:
+            counts[item['status']] += 1
+            item['percent'] = 100
+        percent += item['percent']
+        items.append(item)
+    finished = counts['done'] + counts['error'] == len(items)
+    return {
+        'status':  'done' if finished else 'running',
+        'percent': round(percent / len(items)),
+        'total':   len(items),
+        'done':    counts['done'],
+        'failed':  counts['error'],
+        'format':  batch['format'],
+        'items':   items,
+    }
+
+@routes.route('/batch/<batch_id>', methods=['GET'])
+def batch(batch_id):
+    b = batch_status(batch_id)
+    if b is None:
+        return jsonify(error="Invalid batch ID"), 404
+    return jsonify(b)
+
+@routes.route('/status/<task_id>', methods=['GET'])
 def status(task_id):
-    return jsonify(tasks.get(task_id, {'status':'not found'}))
+    return jsonify(task_status(task_id))
+
+# ── Server-Sent Events: push progress as background_task reports it ──
+def events_base() -> str:
+    """Base URL of the events sidecar as browsers see it, or "" if there is none."""
+    if EVENTS_URL:
+        return EVENTS_URL
+    if not EVENTS_PORT:
+        return ""
+    host = urlparse(request.host_url).hostname
+    host = f"[{host}]" if ":" in host else host
+    return f"{request.scheme}://{host}:{EVENTS_PORT}"
+
+@routes.route('/events/<task_id>', methods=['GET'])
+def events(task_id):
+    try:
+        seen = int(request.headers.get('Last-Event-ID', -1))
+    except ValueError:
+        seen = -1
+
+    if events_base():
+        # the events sidecar holds the stream; this worker thread is free at once
+        return redirect(f"{events_base()}/events/{quote(task_id)}", code=307)
+
+    def stream():
+        # Without the sidecar a WSGI worker thread is busy for as long as this
+        # generator runs, so streams end after SSE_MAX_STREAM_SECS and
+        # EventSource reconnects (resuming via Last-Event-ID).
+        nonlocal seen
+        yield f"retry: {SSE_RETRY_MS}\n\n"
+        deadline = time.monotonic() + SSE_MAX_STREAM_SECS
+        while True:
+            version = TASKS.version(task_id)
+            if version != seen:
+                seen = version
+                payload = task_status(task_id)
+                yield f"id: {version}\nevent: progress\ndata: {json.dumps(payload)}\n\n"
+                if payload.get('status') in ('done', 'error', 'not found'):
+                    return
+            left = deadline - time.monotonic()
+            if left <= 0:
+                return
+            if wait_for_task_change(task_id, seen, min(SSE_HEARTBEAT_SECS, left)) == seen:
+                yield ": heartbeat\n\n"
+
+    return Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control':     'no-cache',
+        'X-Accel-Buffering': 'no',          # don't let nginx buffer the stream
+    })
 
 # ── Return the final result dict once status == 'done' ──
-@app.route('/result/<task_id>', methods=['GET'])
+@routes.route('/result/<task_id>', methods=['GET'])
 def result(task_id):
-    t = tasks.get(task_id)
+    t = TASKS.get(task_id)
     if not t:
         return jsonify(error="Invalid task ID"), 404
     if t.get('status') != 'done':
@@ -504,41 +2996,347 @@ def result(task_id):
     # your background_task stored its final payload under t['result']
     return jsonify(result=t['result']), 200
 
-@app.route('/download/<directory>', methods=['GET'])
+@routes.route('/download/<directory>', methods=['GET'])
 def download_zip(directory):
-    dirpath = os.path.join("downloads", directory)
+    t0 = time.perf_counter()
+    dirpath = os.path.join(DOWNLOADS_DIR, directory)
     if not os.path.isdir(dirpath):
         abort(404)
-    buf = io.BytesIO()
-    with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as zf:
-        for fname in os.listdir(dirpath):
-            # ◀─ skip the master MP3 so only chapter files go into the ZIP
-            if fname == 'full_audio.mp3':
-                continue
-            zf.write(os.path.join(dirpath, fname), arcname=fname)
-    buf.seek(0)
-    return send_file(buf, mimetype='application/zip',
-                     as_attachment=True, download_name=f"{directory}.zip")
+    meta = load_manifest(directory, touch=True) or {}
+
+    # MP3/AAC/Opus barely compress: store entries and stream them as we go,
+    # so the size is known up front and byte ranges can be resumed
+    names = list(dict.fromkeys(meta.get('files') or sorted(os.listdir(dirpath))))   # one entry per name
+    entries = []
+    for fname in names:
+        sliced = chapter_slice(dirpath, meta, fname)
+        if sliced:
+            entries.append((fname, *sliced))
+            continue
+        # ◀─ skip the master file & manifest so only chapter files go into the ZIP
+        path = os.path.join(dirpath, fname)
+        if fname.startswith(('full_audio.', '.')) or not os.path.isfile(path):
+            continue
+        entries.append((fname, path, 0, os.path.getsize(path)))
+    parts, total = stored_zip_layout(entries)
 
-@app.route('/download/<directory>/<filename>', methods=['GET'])
-def download_file(directory, filename):
-    dirpath = os.path.join("downloads", directory)
-    return send_from_directory(dirpath, filename, as_attachment=True)
+    stamp = "|".join(f"{a}:{n}:{os.path.getmtime(p)}" for a, p, _, n in entries)
+    etag = hashlib.sha256(stamp.encode("utf-8")).hexdigest()[:32]
+    zip_name = sanitize_filename(meta.get('video_title') or directory)
+    resp = ranged_response(parts, total, etag, 'application/zip', f"{zip_name}.zip")
+    resp.response = timed_iter(touching_result(resp.response, directory), "zip", t0)
+    return resp
 
-@app.route('/metrics/requests', methods=['GET'])
+@routes.route('/download/<directory>/<filename>', methods=['GET'])
+def download_file(directory, filename):
+    # conditional=True → ETag/Last-Modified + Range (206) handling by werkzeug;
+    # full responses go through wsgi.file_wrapper, i.e. sendfile under gunicorn
+    # (or X-Sendfile when USE_X_SENDFILE is set behind a proxy)
+    dirpath = os.path.join(DOWNLOADS_DIR, directory)
+    result  = load_manifest(directory, touch=True) or {}
+    if filename in (result.get('slices') or {}):
+        # MP3 chapter: a frame-aligned byte slice of the single source file
+        path, offset, length = chapter_slice(dirpath, result, filename)
+        stamp = f"{directory}/{filename}:{offset}:{length}:{os.path.getmtime(path)}"
+        etag  = hashlib.sha256(stamp.encode("utf-8")).hexdigest()[:32]
+        resp  = ranged_response([(path, offset, length)], length, etag, 'audio/mpeg', filename)
+        resp.response = touching_result(resp.response, directory)
+        return resp
+    return send_from_directory(dirpath, filename, as_attachment=True,
+                               conditional=True, etag=True)
+
+@routes.route('/metrics/requests', methods=['GET'])
 def request_metrics():
-    now = time.time()
     windows = [30, 60, 300]  # last 30s, 60s, 5m
     counts = {
-        f"last_{w}s": sum(1 for t in REQUEST_TIMESTAMPS if t >= now - w)
+        f"last_{w}s": REQUEST_RATE.sum_since(w)
         for w in windows
     }
     return jsonify(counts)
 
-@app.route('/', methods=['GET'])
+@routes.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus text exposition of everything the /metrics/* endpoints show."""
+    # Every series carries a worker label (the pid): each gunicorn worker keeps
+    # its own counters, so aggregate with `sum without (worker)`
+    lines, worker = [], os.getpid()
+    def metric(name, kind, help_text, samples):
+        lines.append(f"# HELP ytsplit_{name} {help_text}")
+        lines.append(f"# TYPE ytsplit_{name} {kind}")
+        for labels, value in samples:
+            label_str = ",".join(f'{k}="{v}"' for k, v in {**labels, "worker": worker}.items())
+            lines.append(f"ytsplit_{name}{{{label_str}}} {value}")
+
+    lines.append("# HELP ytsplit_stage_seconds Time spent in each pipeline stage")
+    lines.append("# TYPE ytsplit_stage_seconds histogram")
+    for stage, hist in STAGE_SECONDS.items():
+        buckets, total, count = hist.snapshot()
+        for le, c in buckets:
+            le_str = "+Inf" if le == float("inf") else repr(float(le))
+            lines.append(f'ytsplit_stage_seconds_bucket{{stage="{stage}",le="{le_str}",worker="{worker}"}} {c}')
+        lines.append(f'ytsplit_stage_seconds_sum{{stage="{stage}",worker="{worker}"}} {total}')
+        lines.append(f'ytsplit_stage_seconds_count{{stage="{stage}",worker="{worker}"}} {count}')
+
+    metric("upstream_requests_total", "counter", "Outbound requests per upstream host",
+           [({"host": h}, c.total) for h, c in UPSTREAM_CALLS.items()])
+    metric("upstream_bytes_total", "counter", "Response bytes received per upstream host",
+           [({"host": h}, c.total) for h, c in UPSTREAM_BYTES.items()])
+    metric("upstream_requests_per_second", "gauge", "Outbound request rate over the last 60s",
+           [({"host": h}, c.sum_since(60) / 60) for h, c in UPSTREAM_CALLS.items()])
+    metric("upstream_throughput_bytes_per_second", "gauge", "Download throughput over the last 60s",
+           [({"host": h}, c.sum_since(60) / 60) for h, c in UPSTREAM_BYTES.items()])
+
+    with _cache_lock:
+        cache = dict(CACHE_STATS)
+    metric("result_cache_total", "counter", "Result cache lookups and evictions",
+           [({"event": k}, v) for k, v in cache.items()])
+    for name, c in (("data_api", METADATA_CACHE), ("ytdlp", YTDLP_INFO_CACHE), ("resolved", VIDEO_CACHE)):
+        st = c.stats()
+        metric(f"metadata_cache_{name}_total", "counter", f"Metadata cache ({name}) lookups",
+               [({"event": "hit"}, st["hits"]), ({"event": "miss"}, st["misses"])])
+
+    cookies = COOKIES.stats()
+    metric("cookie_refreshes_total", "counter", "Cookie jar refreshes",
+           [({"kind": "foreground"}, cookies["refreshes"]),
+            ({"kind": "background"}, cookies["background_refreshes"]),
+            ({"kind": "failed"}, cookies["failures"])])
+
+    pool = HTTP_ADAPTER.stats()
+    metric("http_pool_requests_total", "counter", "Requests sent through the shared HTTP pools",
+           [({}, pool["requests"])])
+    metric("http_pool_connections_opened_total", "counter", "New upstream connections (TCP+TLS setups)",
+           [({}, pool["connections_opened"])])
+    metric("http_pool_connections", "gauge", "Pooled upstream connections by state",
+           [({"state": "idle"}, pool["idle"]), ({"state": "in_use"}, pool["in_use"])])
+
+    governor = {host: b.stats() for host, b in GOVERNOR.buckets.items()}
+    metric("governor_rate", "gauge", "Allowed outbound requests per second per upstream host",
+           [({"host": h}, st["rate"]) for h, st in governor.items()])
+    metric("governor_throttled_total", "counter", "429/403 responses per upstream host",
+           [({"host": h}, st["throttled"]) for h, st in governor.items()])
+    metric("governor_wait_seconds_total", "counter", "Time requests spent waiting for the governor",
+           [({"host": h}, st["wait_seconds"]) for h, st in governor.items()])
+
+    jobs = SCHEDULER.stats()
+    metric("jobs", "gauge", "Jobs waiting and running in this worker",
+           [({"state": "queued"}, jobs["queued"]), ({"state": "running"}, jobs["running"])])
+
+    return Response("\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4")
+
+@routes.route('/metrics/http', methods=['GET'])
+def http_metrics():
+    return jsonify(HTTP_ADAPTER.stats())
+
+@routes.route('/metrics/governor', methods=['GET'])
+def governor_metrics():
+    return jsonify(GOVERNOR.stats())
+
+@routes.route('/metrics/cookies', methods=['GET'])
+def cookie_metrics():
+    return jsonify(COOKIES.stats())
+
+@routes.route('/metrics/jobs', methods=['GET'])
+def job_metrics():
+    return jsonify(SCHEDULER.stats())
+
+@routes.route('/metrics/metadata', methods=['GET'])
+def metadata_metrics():
+    return jsonify(
+        data_api=METADATA_CACHE.stats(),
+        ytdlp=YTDLP_INFO_CACHE.stats(),
+        resolved=VIDEO_CACHE.stats(),
+    )
+
+@routes.route('/metrics/cache', methods=['GET'])
+def cache_metrics():
+    entries = cache_entries()
+    with _cache_lock:
+        stats = dict(CACHE_STATS)
+    lookups = stats["hits"] + stats["misses"]
+    return jsonify(
+        **stats,
+        hit_ratio=round(stats["hits"] / lookups, 3) if lookups else None,
+        entries=len(entries),
+        size_mb=round(sum(size for _, size, _ in entries), 2),
+        budget_mb=RESULT_CACHE_MAX_MB,
+    )
+
+# ── Readiness: builds the lazy clients, then checks what a job needs ──
+def warm_clients():
+    """Imports/constructs the heavy clients so the first job doesn't pay for it."""
+    from yt_dlp import YoutubeDL                       # noqa: F401
+    if YOUTUBE_API_KEY:
+        youtube_service()
+
+@routes.route('/ready', methods=['GET'])
+def ready():
+    checks = {}
+    try:
+        warm_clients()
+        checks["clients"] = "ok"
+    except Exception as e:
+        checks["clients"] = f"failed: {e}"
+    checks["api_key"]   = "ok" if YOUTUBE_API_KEY else "missing YOUTUBE_API_KEY"
+    checks["ffmpeg"]    = "ok" if shutil.which("ffmpeg") else "ffmpeg not on PATH"
+    try:
+        checks["downloads"] = "ok" if os.access(get_download_folder(""), os.W_OK) else "not writable"
+    except OSError as e:
+        checks["downloads"] = f"failed: {e}"
+    try:
+        TASKS.version("")
+        checks["task_store"] = "ok"
+    except Exception as e:
+        checks["task_store"] = f"failed: {e}"
+    checks["scheduler"] = "ok" if not SCHEDULER.stats()["closed"] else "shutting down"
+    ok = all(v == "ok" for v in checks.values())
+    return jsonify(ready=ok, checks=checks), 200 if ok else 503
+
+@routes.route('/', methods=['GET'])
 def index():
-    return render_template('index.html')
+    return render_template('index.html', events_base=events_base())
+
+# ───────────────────────────────────────────────────────────────────────────────
+# EVENTS SIDECAR: every /events stream on one asyncio loop
+# ───────────────────────────────────────────────────────────────────────────────
+
+_EVENTS_PATH_RE = re.compile(r"^/events/([\w-]{1,64})$")
+
+class EventHub:
+    """
+    Watches the task store for every open stream at once: one versions()
+    query per SSE_POLL_SECS for all watched tasks, then wakes the streams
+    whose task changed. An idle listener costs a coroutine, not a thread.
+    """
+
+    def __init__(self):
+        self.watchers = {}                   # task_id → set of asyncio.Event
+        self.versions = {}                   # task_id → version at the last poll
+
+    def watch(self, task_id) -> asyncio.Event:
+        event = asyncio.Event()
+        self.watchers.setdefault(task_id, set()).add(event)
+        return event
+
+    def unwatch(self, task_id, event):
+        watchers = self.watchers.get(task_id, set())
+        watchers.discard(event)
+        if not watchers:
+            self.watchers.pop(task_id, None)
+            self.versions.pop(task_id, None)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(SSE_POLL_SECS)
+            if not self.watchers:
+                continue
+            try:
+                versions = await loop.run_in_executor(None, TASKS.versions, list(self.watchers))
+            except Exception:
+                app.logger.exception("Events sidecar: task store poll failed")
+                continue
+            for task_id, version in versions.items():
+                if version != self.versions.get(task_id):
+                    self.versions[task_id] = version
+                    for event in self.watchers.get(task_id, ()):
+                        event.set()
+
+def _stream_update(task_id, seen: int):
+    """(version, status payload) of a task; the payload is None if it is still `seen`."""
+    version = TASKS.version(task_id)
+    return version, (task_status(task_id) if version != seen else None)
+
+async def serve_event_stream(reader, writer, hub: EventHub):
+    """One HTTP/1.1 connection: GET /events/<task_id> as text/event-stream, then close."""
+    loop = asyncio.get_running_loop()
+    cors = b"Access-Control-Allow-Origin: *\r\n"
+    try:
+        head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), SSE_HEARTBEAT_SECS)
+        lines = head.decode("latin-1").split("\r\n")
+        method, target = (lines[0].split(" ") + ["", ""])[:2]
+        headers = {k.strip().lower(): v.strip() for k, _, v in (l.partition(":") for l in lines[1:] if l)}
+        match = _EVENTS_PATH_RE.match(urlparse(target).path)
+        if method == "OPTIONS":
+            writer.write(b"HTTP/1.1 204 No Content\r\n" + cors +
+                         b"Access-Control-Allow-Headers: Last-Event-ID, Cache-Control\r\n"
+                         b"Connection: close\r\n\r\n")
+            return
+        if method != "GET" or not match:
+            writer.write(b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            return
+        task_id = match.group(1)
+        try:
+            seen = int(headers.get("last-event-id", -1))
+        except ValueError:
+            seen = -1
+
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                     b"Cache-Control: no-cache\r\nX-Accel-Buffering: no\r\n" + cors +
+                     b"Connection: close\r\n\r\n" + f"retry: {SSE_RETRY_MS}\n\n".encode())
+        changed = hub.watch(task_id)
+        try:
+            while True:
+                changed.clear()              # before reading, so no update slips between
+                version, payload = await loop.run_in_executor(None, _stream_update, task_id, seen)
+                if payload is not None:
+                    seen = version
+                    writer.write(f"id: {version}\nevent: progress\ndata: {json.dumps(payload)}\n\n".encode())
+                    if payload.get('status') in ('done', 'error', 'not found'):
+                        return
+                await writer.drain()
+                try:
+                    await asyncio.wait_for(changed.wait(), SSE_HEARTBEAT_SECS)
+                except asyncio.TimeoutError:
+                    writer.write(b": heartbeat\n\n")   # also how a gone client is noticed
+        finally:
+            hub.unwatch(task_id, changed)
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        writer.close()
+
+def serve_events(host: str = "0.0.0.0", port: int = None):
+    """
+    Runs the events sidecar until killed. It shares the SQLite task store
+    with the web workers, so it sees every worker's progress updates.
+    """
+    if not isinstance(TASKS, SQLiteTaskStore):
+        raise SystemExit("The events sidecar needs TASK_STORE=sqlite, shared with the web workers")
+
+    async def main():
+        hub = EventHub()
+        server = await asyncio.start_server(
+            lambda r, w: serve_event_stream(r, w, hub), host, port or EVENTS_PORT or 5001, backlog=1024)
+        app.logger.info(f"▶ Events sidecar listening on {host}:{port or EVENTS_PORT or 5001}")
+        async with server:
+            await asyncio.gather(server.serve_forever(), hub.run())
+
+    asyncio.run(main())
+
+# ───────────────────────────────────────────────────────────────────────────────
+# APP FACTORY
+# ───────────────────────────────────────────────────────────────────────────────
+
+def create_app(config: dict = None) -> Flask:
+    """
+    Builds the Flask app. Nothing slow or networked runs here: the Data API
+    client, yt-dlp and Playwright load on first use (or via /ready).
+    """
+    flask_app = Flask(__name__)
+    flask_app.config["USE_X_SENDFILE"] = USE_X_SENDFILE
+    flask_app.config.update(config or {})
+    flask_app.register_blueprint(routes)
+    return flask_app
+
+app = create_app()
 
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=False)
+    if sys.argv[1:2] == ["events"]:
+        serve_events()
+    else:
+        app.run(host="0.0.0.0", port=5000, debug=False)
@@ -0,0 +1,149 @@
+"""
+Shared helpers for the benchmark scripts: synthetic audio, fake chapter lists,
+a local range-capable file server, and importing app.py from the repo root.
+"""
+import os
+import random
+import re
+import sys
+import subprocess
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_app():
+    """Imports app.py from the repo root (no API key needed to import it)."""
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    import app
+    return app
+
+
+def make_synthetic_audio(path, duration, codec="libmp3lame", bitrate="192k"):
+    """
+    Renders `duration` seconds of a beeping tone with ffmpeg.
+    MP4 output gets its moov atom up front, like YouTube's audio/mp4 streams,
+    so it can be demuxed from a pipe. Skips the render if `path` already exists.
+    """
+    if os.path.exists(path):
+        return path
+    extra = ["-movflags", "+faststart"] if path.endswith((".m4a", ".mp4")) else []
+    rate = "48000" if codec == "libopus" else "44100"     # opus has no 44.1 kHz mode
+    subprocess.run([
+        "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+        "-f", "lavfi", "-i", f"sine=frequency=220:beep_factor=4:duration={duration}",
+        "-ac", "2", "-ar", rate,
+        "-c:a", codec, "-b:a", bitrate, *extra, path
+    ], check=True)
+    return path
+
+
+def synthetic_chapters(duration, count):
+    """Evenly spaced chapters in the same shape background_task builds."""
+    step = duration / count
+    chapters = []
+    for i in range(count):
+        chapters.append({
+            "start_time": round(i * step, 3),
+            "end_time":   round((i + 1) * step, 3) if i < count - 1 else duration,
+            "title":      f"Chapter {i + 1:02d}",
+        })
+    return chapters
+
+
+def timed(fn, *args, **kwargs):
+    """Returns (seconds, result) for a single call."""
+    t0 = time.perf_counter()
+    out = fn(*args, **kwargs)
+    return time.perf_counter() - t0, out
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# Local stand-in for googlevideo: static files with Range support & throttling
+# ───────────────────────────────────────────────────────────────────────────────
+
+_RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)")
+
+
+class RangeFileHandler(BaseHTTPRequestHandler):
+    root = "."
+    rate = 0            # bytes/sec per connection, 0 = unlimited
+    drop_prob = 0.0     # chance a response is cut off half-way through
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        self._serve(body=False)
+
+    def do_GET(self):
+        self._serve(body=True)
+
+    def _serve(self, body):
+        path = os.path.join(self.root, self.path.split("?", 1)[0].lstrip("/"))
+        if not os.path.isfile(path):
+            self.send_error(404)
+            return
+        size = os.path.getsize(path)
+        start, end = 0, size - 1
+        m = _RANGE_RE.fullmatch(self.headers.get("Range", ""))
+        if m:
+            if m.group(1):
+                start = int(m.group(1))
+                end = min(int(m.group(2)), size - 1) if m.group(2) else size - 1
+            else:
+                start = max(size - int(m.group(2)), 0)
+            if start > end:
+                self.send_error(416)
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        else:
+            self.send_response(200)
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        if not body:
+            return
+
+        chunk = 64 * 1024
+        with open(path, "rb") as f:
+            f.seek(start)
+            left = end - start + 1
+            if self.drop_prob and random.random() < self.drop_prob:
+                left //= 2
+                self.close_connection = True
+            t0 = time.perf_counter()
+            sent = 0
+            while left > 0:
+                data = f.read(min(chunk, left))
+                if not data:
+                    break
+                try:
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    return
+                left -= len(data)
+                sent += len(data)
+                if self.rate:
+                    ahead = sent / self.rate - (time.perf_counter() - t0)
+                    if ahead > 0:
+                        time.sleep(ahead)
+
+
+def serve_files(root, rate=0, drop_prob=0.0):
+    """
+    Serves `root` on a free localhost port from a daemon thread.
+    Returns (server, base_url); call server.shutdown() when done.
+    """
+    handler = type("Handler", (RangeFileHandler,),
+                   {"root": root, "rate": rate, "drop_prob": drop_prob})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
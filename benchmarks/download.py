@@ -0,0 +1,83 @@
+"""
+One sequential GET vs. the parallel ranged downloader.
+
+The local stand-in throttles every connection (like googlevideo does), and
+--drop-prob cuts responses off half-way to exercise range resume.
+
+    python benchmarks/download.py --size-mb 64 --rate-mbps 20 --workers 4
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import requests
+
+from _support import load_app, serve_files, timed
+
+
+def single_stream(app, url, dst):
+    with open(dst, "wb") as out:
+        for chunk in app.iter_download(requests.Session(), url, chunk_size=1024 * 1024):
+            out.write(chunk)
+    return dst
+
+
+def sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--size-mb", type=int, default=64)
+    ap.add_argument("--rate-mbps", type=float, default=20.0, help="per-connection limit")
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--drop-prob", type=float, default=0.0)
+    args = ap.parse_args()
+
+    app = load_app()
+    work = tempfile.mkdtemp(prefix="bench-download-")
+    server = None
+    try:
+        src = os.path.join(work, "source.bin")
+        with open(src, "wb") as f:
+            f.write(os.urandom(args.size_mb * 1024 * 1024))
+        expected = sha256(src)
+        server, base = serve_files(work, rate=int(args.rate_mbps * 1e6 / 8), drop_prob=args.drop_prob)
+        url = f"{base}/source.bin"
+
+        results = {}
+        runs = (
+            ("single_stream", lambda dst: single_stream(app, url, dst)),
+            ("ranged", lambda dst: app.download_ranged(requests.Session(), url, dst,
+                                                       workers=args.workers)),
+        )
+        for name, fn in runs:
+            dst = os.path.join(work, f"{name}.bin")
+            try:
+                secs, _ = timed(fn, dst)
+            except Exception as e:
+                results[name] = {"error": repr(e)}
+                continue
+            results[name] = {
+                "wall_s": round(secs, 3),
+                "mb_per_s": round(args.size_mb / secs, 2),
+                "intact": sha256(dst) == expected,
+            }
+        print(json.dumps({"size_mb": args.size_mb, "rate_mbps": args.rate_mbps,
+                          "workers": args.workers, "drop_prob": args.drop_prob,
+                          **results}, indent=2))
+    finally:
+        if server:
+            server.shutdown()
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+"""
+End-to-end benchmark: N concurrent jobs through the real Flask routes, with
+every Google endpoint replaced by a local stand-in.
+
+One local HTTP server plays all three upstreams:
+  * /youtube/v3/videos       – Data API videos.list (YOUTUBE_API_ENDPOINT)
+  * /youtubei/v1/player      – Innertube player, adaptiveFormats → local files
+  * /media/<file>            – googlevideo, range-capable and optionally throttled
+Cookie refresh is switched off (COOKIE_REFRESH=0), so no browser is needed.
+
+Each job POSTs /start, waits on /status and then pulls the ZIP from
+/download/<dir>. Per-stage latency comes from the app's own stage timers.
+
+    python benchmarks/e2e.py --jobs 8 --concurrency 4 --duration 1200 --chapters 12
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlparse
+
+from _support import RangeFileHandler, make_synthetic_audio, synthetic_chapters
+
+SOURCES = {
+    # out format → (source file, encoder, bitrate, mimeType the player reports)
+    "mp3":  ("source.m4a",  "aac",     "128k", 'audio/mp4; codecs="mp4a.40.2"'),
+    "m4a":  ("source.m4a",  "aac",     "128k", 'audio/mp4; codecs="mp4a.40.2"'),
+    "opus": ("source.webm", "libopus", "128k", 'audio/webm; codecs="opus"'),
+}
+
+
+class StandInHandler(RangeFileHandler):
+    """Data API + Innertube player + googlevideo, all from one local server."""
+    duration = 0
+    chapters = []
+    source = ""
+    mime = ""
+    base = ""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path.endswith("/youtube/v3/videos"):
+            ids = parse_qs(url.query).get("id", [""])[0].split(",")
+            self._json({"items": [self._video(vid) for vid in ids if vid]})
+        elif url.path.startswith("/media/"):
+            self.path = url.path[len("/media"):]
+            self._serve(body=True)
+        else:
+            self.send_error(404)
+
+    def do_HEAD(self):
+        self.path = urlparse(self.path).path[len("/media"):]
+        self._serve(body=False)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if not urlparse(self.path).path.endswith("/youtubei/v1/player"):
+            self.send_error(404)
+            return
+        vid = json.loads(body or b"{}").get("videoId", "")
+        size = os.path.getsize(os.path.join(self.root, self.source))
+        self._json({"streamingData": {"adaptiveFormats": [{
+            "itag":          140,
+            "mimeType":      self.mime,
+            "contentLength": str(size),
+            "url":           f"{self.base}/media/{self.source}?id={vid}",
+        }]}})
+
+    def _video(self, vid):
+        description = "\n".join(
+            f"{int(c['start_time']) // 60}:{int(c['start_time']) % 60:02d} {c['title']}"
+            for c in self.chapters
+        )
+        return {
+            "id":             vid,
+            "snippet":        {"title": f"Benchmark {vid}", "description": description},
+            "contentDetails": {"duration": f"PT{self.duration}S"},
+        }
+
+    def _json(self, obj):
+        data = json.dumps(obj).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def start_stand_ins(root, source, mime, duration, chapters, rate):
+    from http.server import ThreadingHTTPServer
+    handler = type("Handler", (StandInHandler,), {
+        "root": root, "rate": rate, "source": source, "mime": mime,
+        "duration": duration, "chapters": chapters,
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    handler.base = f"http://127.0.0.1:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, handler.base
+
+
+def run_job(client, video_id, out_format, poll):
+    """One user's journey: /start → /status until done → download the ZIP."""
+    t0 = time.perf_counter()
+    resp = client.post("/start", json={"youtube_url": f"https://youtu.be/{video_id}",
+                                       "format": out_format})
+    if resp.status_code != 202:
+        return {"ok": False, "error": f"/start {resp.status_code}: {resp.get_json()}"}
+    task_id = resp.get_json()["task_id"]
+    queued = None
+    while True:
+        st = client.get(f"/status/{task_id}").get_json()
+        if queued is None and st["status"] != "queued":
+            queued = time.perf_counter() - t0
+        if st["status"] in ("done", "error"):
+            break
+        time.sleep(poll)
+    if st["status"] == "error":
+        return {"ok": False, "error": st.get("error")}
+    done = time.perf_counter() - t0
+    path = st["result"]["path"]
+    zipped = sum(len(chunk) for chunk in client.get(f"/download/{path}").response)
+    return {
+        "ok":         True,
+        "queued_s":   queued or 0.0,
+        "process_s":  done,
+        "total_s":    time.perf_counter() - t0,
+        "zip_bytes":  zipped,
+        "files":      len(st["result"]["files"]),
+    }
+
+
+def summarize(values):
+    if not values:
+        return None
+    values = sorted(values)
+    pick = lambda q: values[min(len(values) - 1, int(q * len(values)))]
+    return {"n": len(values), "mean": round(statistics.fmean(values), 3),
+            "p50": round(pick(0.50), 3), "p95": round(pick(0.95), 3),
+            "max": round(values[-1], 3)}
+
+
+def dir_bytes(path):
+    total = 0
+    for dirpath, _, files in os.walk(path):
+        for f in files:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, f))
+            except OSError:
+                pass
+    return total
+
+
+class DiskSampler(threading.Thread):
+    """Polls the downloads dir size to catch the peak (scratch files included)."""
+
+    def __init__(self, path, every=0.5):
+        super().__init__(daemon=True)
+        self.path, self.every, self.peak = path, every, 0
+        self._halt = threading.Event()
+
+    def run(self):
+        while not self._halt.wait(self.every):
+            self.peak = max(self.peak, dir_bytes(self.path))
+
+    def stop(self):
+        self._halt.set()
+        self.join()
+        self.peak = max(self.peak, dir_bytes(self.path))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--jobs", type=int, default=8, help="total jobs to run")
+    ap.add_argument("--concurrency", type=int, default=4, help="jobs in flight at once")
+    ap.add_argument("--duration", type=int, default=20 * 60, help="seconds of audio per video")
+    ap.add_argument("--chapters", type=int, default=12, help="0 = no timestamps in the description")
+    ap.add_argument("--format", default="mp3", choices=sorted(SOURCES))
+    ap.add_argument("--rate-mbps", type=float, default=0.0, help="per-connection media throttle, 0 = unlimited")
+    ap.add_argument("--same-video", action="store_true", help="every job asks for the same video (cache path)")
+    ap.add_argument("--mode", choices=("file", "stream"), help="PIPELINE_MODE for the app")
+    ap.add_argument("--poll", type=float, default=0.2, help="seconds between /status polls")
+    ap.add_argument("--keep", action="store_true", help="keep the work directory")
+    args = ap.parse_args()
+
+    work = tempfile.mkdtemp(prefix="bench-e2e-")
+    media = os.path.join(work, "media")
+    downloads = os.path.join(work, "downloads")
+    os.makedirs(media)
+
+    source, codec, bitrate, mime = SOURCES[args.format]
+    make_synthetic_audio(os.path.join(media, source), args.duration, codec=codec, bitrate=bitrate)
+    # --chapters 0: descriptions without timestamps, so the app auto-chapters
+    chapters = synthetic_chapters(args.duration, args.chapters) if args.chapters else []
+    server, base = start_stand_ins(media, source, mime, args.duration, chapters,
+                                   rate=int(args.rate_mbps * 1e6 / 8))
+
+    # The app reads its configuration at import time
+    os.environ.update({
+        "YOUTUBE_API_KEY":      "benchmark",
+        "YOUTUBE_API_ENDPOINT": base,
+        "YOUTUBE_PLAYER_URL":   f"{base}/youtubei/v1/player",
+        "COOKIE_REFRESH":       "0",
+        "DOWNLOADS_DIR":        downloads,
+        "MAX_QUEUE":            str(max(args.jobs, 32)),
+    })
+    if args.mode:
+        os.environ["PIPELINE_MODE"] = args.mode
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import app as service
+
+    # keep every stage sample, not just the histogram buckets
+    samples = {stage: [] for stage in service.PIPELINE_STAGES}
+    for stage, hist in service.STAGE_SECONDS.items():
+        def observe(value, _orig=hist.observe, _out=samples[stage]):
+            _out.append(value)
+            _orig(value)
+        hist.observe = observe
+
+    client = service.app.test_client()
+    video_ids = [("bench%06d" % (0 if args.same_video else i))[:11].ljust(11, "x")
+                 for i in range(args.jobs)]
+
+    disk = DiskSampler(downloads)
+    disk.start()
+    ru0 = (resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN))
+    t0 = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            jobs = list(pool.map(lambda vid: run_job(client, vid, args.format, args.poll), video_ids))
+        wall = time.perf_counter() - t0
+        ru1 = (resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN))
+        disk.stop()
+
+        ok = [j for j in jobs if j["ok"]]
+        cpu = {
+            name: round((b.ru_utime + b.ru_stime) - (a.ru_utime + a.ru_stime), 3)
+            for name, a, b in (("app_s", ru0[0], ru1[0]), ("ffmpeg_s", ru0[1], ru1[1]))
+        }
+        report = {
+            "config": {k: getattr(args, k) for k in
+                       ("jobs", "concurrency", "duration", "chapters", "format", "rate_mbps", "same_video")},
+            "pipeline_mode": service.PIPELINE_MODE,
+            "wall_s":        round(wall, 3),
+            "succeeded":     len(ok),
+            "failed":        [j["error"] for j in jobs if not j["ok"]],
+            "throughput": {
+                "jobs_per_min":       round(len(ok) / wall * 60, 2),
+                "audio_x_realtime":   round(len(ok) * args.duration / wall, 1),
+                "zip_mb_per_s":       round(sum(j["zip_bytes"] for j in ok) / wall / 1e6, 2),
+            },
+            "job_latency_s": {k: summarize([j[k] for j in ok]) for k in ("queued_s", "process_s", "total_s")},
+            "stage_latency_s": {stage: summarize(v) for stage, v in samples.items() if v},
+            "cpu":           dict(cpu, utilisation=round(sum(cpu.values()) / wall, 2)),
+            # ru_maxrss is KiB on Linux; children = largest single ffmpeg
+            "peak_rss_mb":   {"app": round(ru1[0].ru_maxrss / 1024, 1),
+                              "ffmpeg": round(ru1[1].ru_maxrss / 1024, 1)},
+            "disk_mb":       {"peak": round(disk.peak / 1e6, 1),
+                              "final": round(dir_bytes(downloads) / 1e6, 1)},
+            "upstream_calls": {h: c.total for h, c in service.UPSTREAM_CALLS.items()},
+        }
+        print(json.dumps(report, indent=2))
+    finally:
+        service.SCHEDULER.shutdown(timeout=5)
+        server.shutdown()
+        if args.keep:
+            print(f"work dir: {work}", file=sys.stderr)
+        else:
+            shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+MP3 chapters: the current encode-then-cut path (one libmp3lame run over the
+whole track, then the single-pass stream-copy split or the frame-index
+slices) vs. MP3_ENCODE=parallel (decode once to PCM, encode every chapter
+as its own ffmpeg process).
+
+The parallel run is repeated for each --workers value, with the CPU_STAGE
+budget set to match. Reports wall time, ffmpeg CPU time and the speedup
+over encode-then-split, and checks that the parallel chapters decode to
+exactly the samples of the chapter ranges (no gaps, no overlaps). A lossless
+run (PCM WAV chapters) also compares the first and last --edge samples of
+every chapter with the source PCM at its boundaries. On a box
+with fewer cores than --project asks about, the speedup there is estimated
+from the measured decode time and per-chapter encode CPU time.
+
+    python benchmarks/encode.py --duration 3600 --chapters 16 --workers 1,4,16
+"""
+import argparse
+import json
+import math
+import os
+import resource
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import wave
+
+from _support import load_app, make_synthetic_audio, synthetic_chapters
+
+
+def children_cpu():
+    ru = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return ru.ru_utime + ru.ru_stime
+
+
+def measure(fn, *args, **kwargs):
+    """(wall seconds, ffmpeg CPU seconds, result) for one call."""
+    cpu0, t0 = children_cpu(), time.perf_counter()
+    out = fn(*args, **kwargs)
+    return time.perf_counter() - t0, children_cpu() - cpu0, out
+
+
+def decoded_samples(path):
+    pcm = subprocess.run(["ffmpeg", "-hide_banner", "-loglevel", "error", "-i", path,
+                          "-f", "s16le", "-ac", "1", "-"], capture_output=True, check=True).stdout
+    return len(pcm) // 2
+
+
+def read_frames(path, first=0, count=None):
+    """Raw 16-bit frames [first, first + count) of a WAV file."""
+    with wave.open(path, "rb") as w:
+        w.setpos(first)
+        return w.readframes(w.getnframes() - first if count is None else count)
+
+
+def boundaries_exact(app, src, chapters, work, edge):
+    """Encodes the chapters losslessly and checks each one's edges against the source PCM."""
+    decoded = os.path.join(work, "reference.wav")
+    rate, channels, _, _ = app.decode_pcm(src, decoded)
+    out = os.path.join(work, "lossless")
+    os.makedirs(out)
+    try:
+        names = app.encode_chapters(src, chapters, out, ext="wav", codec_args=["-c:a", "pcm_s16le"])
+        for ch, name in zip(chapters, names):
+            first, last = round(ch["start_time"] * rate), round(ch["end_time"] * rate)
+            part = read_frames(os.path.join(out, name))
+            n = min(edge, last - first) * channels * 2
+            if len(part) != (last - first) * channels * 2:
+                return False
+            if part[:n] != read_frames(decoded, first, n // (channels * 2)):
+                return False
+            if part[-n:] != read_frames(decoded, last - n // (channels * 2), n // (channels * 2)):
+                return False
+        return True
+    finally:
+        shutil.rmtree(out)
+        os.remove(decoded)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--duration", type=int, default=60 * 60, help="seconds of audio")
+    ap.add_argument("--chapters", type=int, default=16)
+    ap.add_argument("--workers", default=f"1,{os.cpu_count() or 1}", help="comma-separated pool sizes")
+    ap.add_argument("--project", default="4,8,16", help="core counts to estimate the speedup for")
+    ap.add_argument("--edge", type=int, default=1024, help="samples compared at each chapter boundary")
+    args = ap.parse_args()
+
+    app = load_app()
+    work = tempfile.mkdtemp(prefix="bench-encode-")
+    try:
+        src = make_synthetic_audio(os.path.join(work, "source.m4a"), args.duration, codec="aac", bitrate="128k")
+        chapters = synthetic_chapters(args.duration, args.chapters)
+        report = {"duration_s": args.duration, "chapters": args.chapters,
+                  "cores": len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()}
+
+        # 1) current path: one encode of the whole track, then cut it
+        out = os.path.join(work, "single")
+        os.makedirs(out)
+        mp3 = os.path.join(out, "full_audio.mp3")
+        wall, cpu, _ = measure(subprocess.run, [
+            "ffmpeg", "-y", "-hide_banner", "-loglevel", "error", "-i", src,
+            "-vn", "-codec:a", "libmp3lame", "-b:a", app.MP3_BITRATE, mp3], check=True)
+        report["transcode"] = {"wall_s": round(wall, 3), "cpu_s": round(cpu, 3)}
+        split_wall, split_cpu, _ = measure(app.split_chapters, mp3, chapters, out)
+        report["encode_then_split"] = {"wall_s": round(wall + split_wall, 3), "cpu_s": round(cpu + split_cpu, 3)}
+        sliced = os.path.join(work, "sliced")
+        os.makedirs(sliced)
+        slice_wall, _, _ = measure(app.slice_chapters, mp3, chapters, sliced)
+        report["encode_then_slice"] = {"wall_s": round(wall + slice_wall, 3)}
+        baseline = wall + split_wall
+
+        # 2) decode once, encode chapters in parallel
+        decode_wall, decode_cpu, (rate, _, _, _) = measure(app.decode_pcm, src, os.path.join(work, "decoded.wav"))
+        os.remove(os.path.join(work, "decoded.wav"))
+        report["decode"] = {"wall_s": round(decode_wall, 3), "cpu_s": round(decode_cpu, 3)}
+        expected = [round(c["end_time"] * rate) - round(c["start_time"] * rate) for c in chapters]
+        per_chapter = float("inf")             # encode CPU seconds per chapter, best run
+        for n in (int(w) for w in args.workers.split(",")):
+            out = os.path.join(work, f"parallel{n}")
+            os.makedirs(out)
+            app.CPU_STAGE = threading.BoundedSemaphore(n)
+            wall, cpu, names = measure(app.encode_chapters, src, chapters, out, workers=n)
+            got = [decoded_samples(os.path.join(out, name)) for name in names]
+            report[f"parallel_{n}"] = {
+                "wall_s":  round(wall, 3),
+                "cpu_s":   round(cpu, 3),
+                "speedup": round(baseline / wall, 2),
+                "sample_exact": got == expected,
+            }
+            shutil.rmtree(out)
+            per_chapter = min(per_chapter, (cpu - decode_cpu) / len(chapters))
+
+        report["boundaries_exact"] = boundaries_exact(app, src, chapters, work, args.edge)
+
+        # estimate: decode, then ceil(chapters / cores) rounds of one chapter encode each
+        report["projected_speedup"] = {
+            f"{cores}_cores": round(baseline / (decode_wall + math.ceil(len(chapters) / cores) * per_chapter), 2)
+            for cores in (int(c) for c in args.project.split(","))
+        }
+        print(json.dumps(report, indent=2))
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Outbound request governor under a rate-limited upstream: ungoverned
+clients vs. the AIMD token bucket in app.GOVERNOR.
+
+The stand-in player endpoint allows --limit requests per second and answers
+429 beyond that. Like YouTube, it also holds a grudge: going over the limit
+gets every request refused for the next --penalty seconds. --threads workers
+POST as fast as they can for --seconds, pausing --retry-delay after a 429.
+Reports good requests per second, refusals, and the rate the governor
+settled at (it should sit just under --limit).
+
+    python benchmarks/governor.py --limit 40 --threads 16 --seconds 30
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer
+
+from _support import load_app
+from e2e import StandInHandler
+
+
+class LimitedHandler(StandInHandler):
+    """Player stand-in behind a fixed-rate token bucket with a refusal penalty."""
+    limit = 40.0
+    penalty = 1.0
+    lock = threading.Lock()
+    tokens = 0.0
+    last = 0.0
+    banned_until = 0.0
+
+    def do_POST(self):
+        cls = type(self)
+        with cls.lock:
+            now = time.monotonic()
+            cls.tokens = min(cls.limit, cls.tokens + max(0.0, now - cls.last) * cls.limit)
+            cls.last = max(cls.last, now)
+            allowed = now >= cls.banned_until and cls.tokens >= 1
+            if allowed:
+                cls.tokens -= 1
+            elif now >= cls.banned_until:
+                cls.banned_until = now + cls.penalty
+                cls.tokens, cls.last = 1.0, cls.banned_until   # no burst saved up during the ban
+        if allowed:
+            super().do_POST()
+            return
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(429)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+def start_server(root, limit, penalty):
+    handler = type("Handler", (LimitedHandler,), {
+        "root": root, "source": "media.bin", "mime": 'audio/mp4; codecs="mp4a.40.2"',
+        "limit": limit, "penalty": penalty, "tokens": limit, "last": time.monotonic(),
+        "banned_until": 0.0, "lock": threading.Lock(),
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    handler.base = f"http://127.0.0.1:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, handler
+
+
+def run(app, base, args):
+    """Hammers the player endpoint for args.seconds; returns the outcome counts."""
+    counts = {"ok": 0, "refused": 0}
+    lock = threading.Lock()
+    deadline = time.monotonic() + args.seconds
+
+    def worker(_):
+        session = app.http_session()
+        while time.monotonic() < deadline:
+            resp = session.post(f"{base}/youtubei/v1/player", json={"videoId": "governor"})
+            with lock:
+                counts["ok" if resp.ok else "refused"] += 1
+            if resp.status_code == 429:
+                time.sleep(args.retry_delay)
+
+    t0 = time.monotonic()
+    with ThreadPoolExecutor(args.threads) as pool:
+        list(pool.map(worker, range(args.threads)))
+    wall = time.monotonic() - t0
+    return {
+        "good_per_s":    round(counts["ok"] / wall, 1),
+        "refused":       counts["refused"],
+        "refused_ratio": round(counts["refused"] / max(1, sum(counts.values())), 3),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--limit", type=float, default=40.0, help="requests/s the upstream tolerates")
+    ap.add_argument("--penalty", type=float, default=3.0, help="seconds refused after going over the limit")
+    ap.add_argument("--ceiling", type=float, default=100.0, help="governor's innertube ceiling (requests/s)")
+    ap.add_argument("--threads", type=int, default=16)
+    ap.add_argument("--seconds", type=float, default=20.0)
+    ap.add_argument("--retry-delay", type=float, default=0.05, help="client pause after a 429")
+    args = ap.parse_args()
+
+    work = tempfile.mkdtemp(prefix="bench-governor-")
+    os.environ["DOWNLOADS_DIR"] = os.path.join(work, "downloads")
+    os.environ["GOVERNOR_MAX_RPS"] = f"innertube={args.ceiling}"
+    with open(os.path.join(work, "media.bin"), "wb") as f:
+        f.write(b"\0" * 1024)
+
+    app = load_app()
+    try:
+        report = {"config": vars(args)}
+        for name, enabled in (("ungoverned", False), ("governed", True)):
+            server, handler = start_server(work, args.limit, args.penalty)
+            app.GOVERNOR.enabled = enabled
+            report[name] = run(app, handler.base, args)
+            server.shutdown()
+        report["governed"]["governor"] = app.GOVERNOR.buckets["innertube"].stats()
+        print(json.dumps(report, indent=2))
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Download-then-transcode ("file") vs. download piped into ffmpeg ("stream").
+
+A local throttled HTTP server stands in for googlevideo and serves a
+synthetic AAC track, so network time and encode time can overlap.
+
+    python benchmarks/pipeline.py --duration 1800 --chapters 20 --rate-mbps 16
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+
+import requests
+
+from _support import load_app, make_synthetic_audio, serve_files, synthetic_chapters, timed
+
+
+def file_pipeline(app, url, chapters, folder):
+    """The default path: whole source to disk, full MP3 encode, then split."""
+    session = requests.Session()
+    src = os.path.join(folder, "full_audio.m4a")
+    with open(src, "wb") as out:
+        for chunk in app.iter_download(session, url, chunk_size=1024 * 1024):
+            out.write(chunk)
+    mp3 = os.path.join(folder, "full_audio.mp3")
+    subprocess.run([
+        "ffmpeg", "-y", "-hide_banner", "-loglevel", "error", "-i", src,
+        "-vn", "-codec:a", "libmp3lame", "-b:a", app.MP3_BITRATE, mp3
+    ], check=True)
+    os.remove(src)
+    files = app.split_chapters(mp3, chapters, folder)
+    os.remove(mp3)
+    return files
+
+
+def stream_pipeline(app, url, chapters, folder):
+    """PIPELINE_MODE=stream: the response body is fed to one encode+split ffmpeg."""
+    session = requests.Session()
+    return app.split_chapters(
+        None, chapters, folder,
+        codec_args=["-c:a", "libmp3lame", "-b:a", app.MP3_BITRATE],
+        feed=app.iter_download(session, url),
+    )
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--duration", type=int, default=30 * 60, help="seconds of audio")
+    ap.add_argument("--chapters", type=int, default=20)
+    ap.add_argument("--rate-mbps", type=float, default=16.0, help="simulated link speed, 0 = unlimited")
+    args = ap.parse_args()
+
+    app = load_app()
+    work = tempfile.mkdtemp(prefix="bench-pipeline-")
+    server = None
+    try:
+        make_synthetic_audio(os.path.join(work, "source.m4a"), args.duration, codec="aac", bitrate="128k")
+        server, base = serve_files(work, rate=int(args.rate_mbps * 1e6 / 8))
+        url = f"{base}/source.m4a"
+        chapters = synthetic_chapters(args.duration, args.chapters)
+
+        results = {}
+        for name, fn in (("file", file_pipeline), ("stream", stream_pipeline)):
+            out = os.path.join(work, name)
+            os.makedirs(out)
+            secs, files = timed(fn, app, url, chapters, out)
+            assert len(files) == len(chapters), (name, len(files))
+            results[name] = {"wall_s": round(secs, 3)}
+        results["speedup"] = round(results["file"]["wall_s"] / results["stream"]["wall_s"], 2)
+        print(json.dumps({"duration_s": args.duration, "chapters": args.chapters,
+                          "rate_mbps": args.rate_mbps, **results}, indent=2))
+    finally:
+        if server:
+            server.shutdown()
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Silence detection for auto-chaptering: NumPy RMS over streamed PCM
+(app.find_silences) vs. ffmpeg's silencedetect filter.
+
+The synthetic track is a tone with a silent gap every --every seconds, so
+both detectors should find the same gaps. Reports wall time, Python heap
+peak and how closely the gap edges agree.
+
+    python benchmarks/silence.py --duration 5400 --every 300 --gap 3
+"""
+import argparse
+import json
+import os
+import re
+import resource
+import shutil
+import subprocess
+import tempfile
+import tracemalloc
+
+from _support import load_app, timed
+
+
+def make_track(path, duration, every, gap):
+    """A 220 Hz tone, silent for `gap` seconds at the end of every `every` seconds."""
+    expr = f"0.5*sin(2*PI*220*t)*lt(mod(t\\,{every})\\,{every - gap})"
+    subprocess.run([
+        "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+        "-f", "lavfi", "-i", f"aevalsrc={expr}:s=44100:d={duration}",
+        "-ac", "2", "-c:a", "libmp3lame", "-b:a", "192k", path,
+    ], check=True)
+    return path
+
+
+def silencedetect(src, threshold_db, min_silence, downmix):
+    extra = ["-ac", "1", "-ar", "8000"] if downmix else []
+    err = subprocess.run([
+        "ffmpeg", "-hide_banner", "-nostats", "-i", src, *extra,
+        "-af", f"silencedetect=noise={threshold_db}dB:d={min_silence}", "-f", "null", "-",
+    ], capture_output=True, text=True, check=True).stderr
+    starts = [float(x) for x in re.findall(r"silence_start: ([\d.]+)", err)]
+    ends   = [float(x) for x in re.findall(r"silence_end: ([\d.]+)", err)]
+    return list(zip(starts, ends))
+
+
+def max_edge_error(a, b):
+    if len(a) != len(b):
+        return None
+    return round(max((max(abs(x[0] - y[0]), abs(x[1] - y[1])) for x, y in zip(a, b)), default=0), 3)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--duration", type=int, default=90 * 60, help="seconds of audio")
+    ap.add_argument("--every", type=float, default=300, help="seconds between gaps")
+    ap.add_argument("--gap", type=float, default=3, help="gap length in seconds")
+    args = ap.parse_args()
+
+    app = load_app()
+    work = tempfile.mkdtemp(prefix="bench-silence-")
+    try:
+        src = make_track(os.path.join(work, "track.mp3"), args.duration, args.every, args.gap)
+        th, ms = app.SILENCE_THRESHOLD_DB, app.SILENCE_MIN_SECS
+
+        tracemalloc.start()
+        secs, (gaps, duration) = timed(app.find_silences, src, th, ms)
+        heap_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        chapters = app.silence_chapters(src)
+        numpy_run = {
+            "wall_s":        round(secs, 3),
+            "gaps":          len(gaps),
+            "chapters":      len(chapters),
+            "heap_peak_mib": round(heap_peak / 2**20, 2),
+            "ffmpeg_peak_rss_mib": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+        }
+
+        report = {"duration_s": args.duration, "track_s": round(duration, 2),
+                  "expected_gaps": int(args.duration // args.every), "numpy_rms": numpy_run}
+        for name, downmix in (("silencedetect", False), ("silencedetect_8k_mono", True)):
+            secs, found = timed(silencedetect, src, th, ms, downmix)
+            report[name] = {"wall_s": round(secs, 3), "gaps": len(found),
+                            "max_edge_diff_s": max_edge_error(gaps, found)}
+        report["speedup_vs_silencedetect"] = round(report["silencedetect"]["wall_s"] / numpy_run["wall_s"], 2)
+        print(json.dumps(report, indent=2))
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Serving MP3 chapters: one file per chapter vs. byte slices of a single source
+via its frame index vs. cutting with ffmpeg on every request.
+
+Reports one-off preparation time and disk use, plus per-chapter request
+latency and Python heap peak (tracemalloc) through the real
+/download/<dir>/<file> route.
+
+    python benchmarks/slices.py --duration 3600 --chapters 20 --requests 60
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+from _support import make_synthetic_audio, synthetic_chapters, timed
+
+
+def dir_mb(path):
+    return round(sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path)) / 1e6, 2)
+
+
+def measure(fn, names, requests):
+    """Latency and heap peak of `requests` random chapter fetches."""
+    lat, peaks = [], []
+    for _ in range(requests):
+        name = random.choice(names)
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        body = fn(name)
+        lat.append((time.perf_counter() - t0) * 1e3)
+        peaks.append(tracemalloc.get_traced_memory()[1] / 1024)
+        tracemalloc.stop()
+        assert body > 0, name
+    lat.sort()
+    return {
+        "p50_ms":        round(statistics.median(lat), 2),
+        "p95_ms":        round(lat[int(0.95 * (len(lat) - 1))], 2),
+        "heap_peak_kib": round(max(peaks), 1),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--duration", type=int, default=60 * 60, help="seconds of audio")
+    ap.add_argument("--chapters", type=int, default=20)
+    ap.add_argument("--requests", type=int, default=60, help="chapter downloads per strategy")
+    args = ap.parse_args()
+
+    work = tempfile.mkdtemp(prefix="bench-slices-")
+    os.environ["DOWNLOADS_DIR"] = work
+    from _support import load_app
+    app = load_app()
+    client = app.app.test_client()
+
+    try:
+        src = make_synthetic_audio(os.path.join(work, "src.mp3"), args.duration)
+        chapters = synthetic_chapters(args.duration, args.chapters)
+        report = {"duration_s": args.duration, "chapters": args.chapters}
+
+        def fetch(key):
+            def get(name):
+                resp = client.get(f"/download/{key}/{name}")
+                size = sum(len(chunk) for chunk in resp.response)
+                resp.close()
+                return size
+            return get
+
+        # 1) a file per chapter (split once, then sendfile)
+        os.makedirs(os.path.join(work, "files"))
+        shutil.copy(src, os.path.join(work, "files", "full_audio.mp3"))
+        secs, names = timed(app.split_chapters, os.path.join(work, "files", "full_audio.mp3"),
+                            chapters, os.path.join(work, "files"))
+        os.remove(os.path.join(work, "files", "full_audio.mp3"))
+        app.cache_store("files", {"files": names})
+        report["files"] = {"prepare_s": round(secs, 3), "disk_mb": dir_mb(os.path.join(work, "files")),
+                           **measure(fetch("files"), names, args.requests)}
+
+        # 2) byte slices of one source through the frame index
+        os.makedirs(os.path.join(work, "slices"))
+        shutil.copy(src, os.path.join(work, "slices", "full_audio.mp3"))
+        secs, (names, slices) = timed(app.slice_chapters, os.path.join(work, "slices", "full_audio.mp3"),
+                                      chapters, os.path.join(work, "slices"))
+        app.cache_store("slices", {"files": names, "source": app.MP3_SOURCE_NAME, "slices": slices})
+        index = os.path.join(work, "slices", app.MP3_SOURCE_NAME + ".idx")
+        report["slices"] = {"prepare_s": round(secs, 3), "disk_mb": dir_mb(os.path.join(work, "slices")),
+                            "index_kib": round(os.path.getsize(index) / 1024, 1),
+                            **measure(fetch("slices"), names, args.requests)}
+
+        # 3) cut with ffmpeg for each request (no preparation, no extra disk)
+        by_name = {f"{c['title']}.mp3": c for c in chapters}
+        def ffmpeg_cut(name):
+            ch = by_name[name]
+            out = subprocess.run([
+                "ffmpeg", "-hide_banner", "-loglevel", "error",
+                "-ss", str(ch["start_time"]), "-to", str(ch["end_time"]), "-i", src,
+                "-c", "copy", "-f", "mp3", "pipe:1",
+            ], capture_output=True, check=True)
+            return len(out.stdout)
+        report["ffmpeg_per_request"] = measure(ffmpeg_cut, list(by_name), args.requests)
+
+        print(json.dumps(report, indent=2))
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
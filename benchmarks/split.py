@@ -0,0 +1,65 @@
+"""
+Per-chapter ffmpeg runs vs. the single-pass segment splitter.
+
+    python benchmarks/split.py --duration 5400 --chapters 40
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+
+from _support import load_app, make_synthetic_audio, synthetic_chapters, timed
+
+
+def split_per_chapter(src, chapters, folder):
+    """The old step 5: one ffmpeg process (and one full re-probe) per chapter."""
+    files = []
+    for ch in chapters:
+        part = f"{ch['title']}.mp3"
+        subprocess.run([
+            "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+            "-i", src,
+            "-ss", str(ch['start_time']),
+            "-to", str(ch['end_time']),
+            "-c", "copy", os.path.join(folder, part)
+        ], check=True)
+        files.append(part)
+    return files
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--duration", type=int, default=90 * 60, help="seconds of audio")
+    ap.add_argument("--chapters", type=int, default=40)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    app = load_app()
+    work = tempfile.mkdtemp(prefix="bench-split-")
+    try:
+        src = make_synthetic_audio(os.path.join(work, "full_audio.mp3"), args.duration)
+        chapters = synthetic_chapters(args.duration, args.chapters)
+
+        results = {}
+        for name, fn in (("per_chapter", split_per_chapter),
+                         ("single_pass", app.split_chapters)):
+            runs = []
+            for _ in range(args.repeat):
+                out = os.path.join(work, name)
+                shutil.rmtree(out, ignore_errors=True)
+                os.makedirs(out)
+                secs, files = timed(fn, src, chapters, out)
+                assert len(files) == len(chapters), (name, len(files))
+                runs.append(secs)
+            results[name] = {"best_s": round(min(runs), 3), "runs_s": [round(r, 3) for r in runs]}
+
+        results["speedup"] = round(results["per_chapter"]["best_s"] / results["single_pass"]["best_s"], 2)
+        print(json.dumps({"duration_s": args.duration, "chapters": args.chapters, **results}, indent=2))
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
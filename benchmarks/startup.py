@@ -0,0 +1,85 @@
+"""
+Import / boot time of app.py, measured in fresh interpreters, against a target.
+
+Each run starts a new Python process that imports the app (as a gunicorn
+worker does), builds the test client and serves GET /. Optionally it then
+hits /ready to time the lazy client construction that startup skipped.
+Exits non-zero if the median boot time is over --target-ms, so CI can track
+the budget; tests/test_startup.py runs the same check under pytest.
+
+    python benchmarks/startup.py --runs 5 --target-ms 400
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from _support import ROOT
+
+PROBE = r"""
+import json, os, sys, time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+client = app.app.test_client()
+assert client.get("/").status_code == 200
+t2 = time.perf_counter()
+out = {"import_ms": (t1 - t0) * 1e3, "first_request_ms": (t2 - t1) * 1e3,
+       "heavy_modules_loaded": sorted(m for m in ("yt_dlp", "playwright", "googleapiclient")
+                                      if m in sys.modules)}
+if os.environ.get("PROBE_READY") == "1":
+    resp = client.get("/ready")
+    out["ready_ms"] = (time.perf_counter() - t2) * 1e3
+    out["ready_status"] = resp.status_code
+print(json.dumps(out))
+"""
+
+
+def probe(env, ready):
+    env = dict(env, PROBE_READY="1" if ready else "0")
+    out = subprocess.run([sys.executable, "-c", PROBE], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def measure(runs=5, target_ms=400.0, ready=False):
+    """Median boot time over `runs` fresh interpreters, checked against `target_ms`."""
+    env = dict(os.environ, DOWNLOADS_DIR=tempfile.mkdtemp(prefix="bench-startup-"))
+    env.pop("YOUTUBE_API_KEY", None)          # must import fine without a key
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+
+    probe(env, False)                          # warm the bytecode / page cache
+    results = [probe(env, ready) for _ in range(runs)]
+
+    boot = [r["import_ms"] + r["first_request_ms"] for r in results]
+    report = {
+        "runs":             runs,
+        "import_ms":        round(statistics.median(r["import_ms"] for r in results), 1),
+        "first_request_ms": round(statistics.median(r["first_request_ms"] for r in results), 1),
+        "boot_ms":          round(statistics.median(boot), 1),
+        "target_ms":        target_ms,
+        "heavy_modules_loaded": results[-1]["heavy_modules_loaded"],
+    }
+    if ready:
+        report["ready_ms"] = round(statistics.median(r["ready_ms"] for r in results), 1)
+    report["within_target"] = report["boot_ms"] <= target_ms
+    return report
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--target-ms", type=float, default=400.0, help="budget for median import + first request")
+    ap.add_argument("--ready", action="store_true", help="also time /ready (builds the lazy clients)")
+    args = ap.parse_args()
+
+    report = measure(args.runs, args.target_ms, args.ready)
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if report["within_target"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+HTTP transport: a fresh requests.Session per job (the old behaviour) vs.
+per-job sessions on the shared pooled adapter (app.http_session).
+
+Each job does what background_task does on the network: one Innertube
+player POST, then a ranged download of the media it points to, against
+the local stand-ins from e2e.py. New connections can be made to cost what
+they do on the internet: --tls serves HTTPS with a throwaway self-signed
+certificate (real handshakes) and --setup-ms adds a fixed delay per new
+connection (the TCP/TLS round trips). The server counts the connections
+it accepted, so reuse is visible from both ends.
+
+    python benchmarks/transport.py --jobs 200 --concurrency 8 --tls --setup-ms 40
+"""
+import argparse
+import json
+import os
+import shutil
+import ssl
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer
+
+from _support import load_app
+from e2e import StandInHandler
+
+
+class CountingHandler(StandInHandler):
+    """Stand-in that pays a set-up cost (and optional TLS) per new connection."""
+    setup_delay = 0.0
+    tls = None
+    connections = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        with self.lock:
+            type(self).connections += 1
+        if self.setup_delay:
+            time.sleep(self.setup_delay)
+        if self.tls:
+            self.request = self.tls.wrap_socket(self.request, server_side=True)
+        super().setup()
+
+
+def self_signed_cert(work):
+    cert, key = os.path.join(work, "cert.pem"), os.path.join(work, "key.pem")
+    subprocess.run([
+        "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+        "-keyout", key, "-out", cert, "-subj", "/CN=127.0.0.1",
+        "-addext", "subjectAltName=IP:127.0.0.1",
+    ], check=True, capture_output=True)
+    return cert, key
+
+
+def start_server(root, source, setup_ms, cert):
+    tls = None
+    if cert:
+        tls = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        tls.load_cert_chain(*cert)
+    handler = type("Handler", (CountingHandler,), {
+        "root": root, "source": source, "mime": 'audio/mp4; codecs="mp4a.40.2"',
+        "setup_delay": setup_ms / 1000, "tls": tls, "connections": 0,
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    handler.base = f"{'https' if tls else 'http'}://127.0.0.1:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, handler
+
+
+def run(app, make_session, handler, args, work):
+    """All jobs with one session factory; returns throughput and latency."""
+    size = args.media_kb * 1024
+
+    def job(i):
+        t0 = time.perf_counter()
+        session = make_session()
+        resp = session.post(f"{handler.base}/youtubei/v1/player", json={"videoId": f"job{i}"})
+        resp.raise_for_status()
+        url = resp.json()["streamingData"]["adaptiveFormats"][0]["url"]
+        dst = os.path.join(work, f"job{i}.bin")
+        app.download_ranged(session, url, dst, total=size, range_size=args.range_kb * 1024)
+        os.remove(dst)
+        return time.perf_counter() - t0
+
+    before = handler.connections
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        lat = sorted(pool.map(job, range(args.jobs)))
+    wall = time.perf_counter() - t0
+    return {
+        "wall_s":          round(wall, 3),
+        "jobs_per_s":      round(args.jobs / wall, 1),
+        "mb_per_s":        round(args.jobs * size / wall / 1e6, 1),
+        "job_p50_ms":      round(statistics.median(lat) * 1e3, 1),
+        "job_p95_ms":      round(lat[int(0.95 * (len(lat) - 1))] * 1e3, 1),
+        "connections":     handler.connections - before,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--jobs", type=int, default=200)
+    ap.add_argument("--concurrency", type=int, default=8, help="jobs in flight at once")
+    ap.add_argument("--media-kb", type=int, default=1024, help="media size per job")
+    ap.add_argument("--range-kb", type=int, default=256, help="range request size")
+    ap.add_argument("--setup-ms", type=float, default=20.0, help="extra cost per new connection")
+    ap.add_argument("--tls", action="store_true", help="HTTPS with a self-signed certificate")
+    args = ap.parse_args()
+
+    work = tempfile.mkdtemp(prefix="bench-transport-")
+    os.environ["DOWNLOADS_DIR"] = os.path.join(work, "downloads")
+    os.environ["GOVERNOR"] = "0"             # measure the transport, not the pacing
+    cert = self_signed_cert(work) if args.tls else None
+    if cert:
+        os.environ["REQUESTS_CA_BUNDLE"] = cert[0]
+    with open(os.path.join(work, "media.bin"), "wb") as f:
+        f.write(os.urandom(args.media_kb * 1024))
+
+    app = load_app()
+    server, handler = start_server(work, "media.bin", args.setup_ms, cert)
+
+    def fresh_session():
+        session = app.requests.Session()
+        session.headers.update(app.COMMON_HEADERS)
+        return session
+
+    try:
+        report = {"config": vars(args)}
+        report["session_per_job"] = run(app, fresh_session, handler, args, work)
+        report["shared_pool"] = run(app, app.http_session, handler, args, work)
+        pool = app.HTTP_ADAPTER.stats()
+        report["shared_pool"]["pool"] = {k: pool[k] for k in ("connections_opened", "requests", "reuse_ratio")}
+        report["speedup"] = round(report["shared_pool"]["jobs_per_s"] / report["session_per_job"]["jobs_per_s"], 2)
+        print(json.dumps(report, indent=2))
+    finally:
+        server.shutdown()
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
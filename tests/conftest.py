@@ -0,0 +1,17 @@
+"""
+Imports app.py from the repo root for the tests, offline: no API key, no
+browser, no pacing, and task state and downloads in a throwaway directory.
+"""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+os.environ["DOWNLOADS_DIR"] = tempfile.mkdtemp(prefix="ytsplit-tests-")
+os.environ["TASK_STORE"] = "memory"
+os.environ["COOKIE_REFRESH"] = "0"
+os.environ["GOVERNOR"] = "0"
+os.environ.pop("YOUTUBE_API_KEY", None)
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
@@ -0,0 +1,20 @@
+"""
+background_task's ordering around the result cache, with the network
+steps replaced.
+"""
+import app
+
+
+def test_cache_hit_skips_cookie_refresh(monkeypatch):
+    refreshed = []
+    monkeypatch.setattr(app, "maybe_refresh_cookies", refreshed.append)
+    monkeypatch.setattr(app, "resolve_video", lambda vid, url, meta=None: {
+        "title": "Cached", "chapters": [], "duration_secs": 60})
+    monkeypatch.setattr(app, "cache_lookup", lambda key: {"folder": key, "files": ["Cached.mp3"]})
+
+    app.create_task("cache-hit", status="queued", percent=0)
+    app.background_task("cache-hit", "https://www.youtube.com/watch?v=cachehit001")
+
+    task = app.TASKS.get("cache-hit")
+    assert task["status"] == "done" and task["result"]["cached"]
+    assert refreshed == []
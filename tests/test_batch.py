@@ -0,0 +1,145 @@
+"""
+/batch and the batched Data API helpers against a stub YOUTUBE_SERVICE:
+videos.list in chunks of DATA_API_BATCH IDs, playlist and URL dedupe, and
+the length limits.
+"""
+import pytest
+
+import app
+
+
+class StubRequest:
+    def __init__(self, resp):
+        self.resp = resp
+
+    def execute(self, http=None):
+        return self.resp
+
+
+class StubService:
+    """Just enough of the Data API client for videos.list and playlistItems.list."""
+
+    def __init__(self, durations, playlist=()):
+        self.durations = durations             # video ID -> ISO8601 duration
+        self.playlist = list(playlist)
+        self.video_calls = []                  # IDs asked for, per videos.list call
+        self.playlist_pages = 0
+
+    def videos(self):
+        return self
+
+    def playlistItems(self):
+        return StubPlaylistItems(self)
+
+    def list(self, part, id, maxResults):
+        ids = id.split(",")
+        assert len(ids) <= maxResults
+        self.video_calls.append(ids)
+        return StubRequest({"items": [
+            {"id": vid,
+             "snippet": {"title": f"Video {vid}", "description": "0:00 Intro\n1:00 Outro"},
+             "contentDetails": {"duration": self.durations[vid]}}
+            for vid in ids if vid in self.durations
+        ]})
+
+
+class StubPlaylistItems:
+    def __init__(self, service):
+        self.service = service
+
+    def list(self, part, playlistId, maxResults, pageToken=None):
+        self.service.playlist_pages += 1
+        start = int(pageToken or 0)
+        page = self.service.playlist[start:start + maxResults]
+        resp = {"items": [{"contentDetails": {"videoId": vid}} for vid in page],
+                "pageInfo": {"totalResults": len(self.service.playlist)}}
+        if start + maxResults < len(self.service.playlist):
+            resp["nextPageToken"] = str(start + maxResults)
+        return StubRequest(resp)
+
+
+def video_ids(prefix, n):
+    """n distinct 11-character video IDs."""
+    return [f"{prefix}{i:0{11 - len(prefix)}d}" for i in range(n)]
+
+
+@pytest.fixture
+def service(monkeypatch):
+    stub = StubService({})
+    monkeypatch.setattr(app, "YOUTUBE_SERVICE", stub)
+    return stub
+
+
+@pytest.fixture
+def queued(monkeypatch):
+    """Jobs /batch hands to the scheduler (captured instead of run)."""
+    jobs = []
+    monkeypatch.setattr(app.SCHEDULER, "submit_many",
+                        lambda batch, priority=0: jobs.extend(batch) or list(range(len(batch))))
+    return jobs
+
+
+def post_batch(**body):
+    return app.app.test_client().post("/batch", json=body)
+
+
+def test_videos_metadata_in_chunks_of_50(service):
+    ids = video_ids("chunk", 120)
+    service.durations.update(dict.fromkeys(ids, "PT5M"))
+    found = app.fetch_videos_metadata(ids)
+    assert [len(call) for call in service.video_calls] == [50, 50, 20]
+    assert sum(service.video_calls, []) == ids
+    assert set(found) == set(ids)
+
+
+def test_batch_dedupes_urls_and_playlist(service, queued):
+    ids = video_ids("dedup", 4)
+    service.durations.update(dict.fromkeys(ids, "PT5M"))
+    service.playlist = [ids[1], ids[2], ids[2], ids[3]]
+    resp = post_batch(youtube_urls=[f"https://youtu.be/{ids[0]}", f"https://youtu.be/{ids[1]}",
+                                    f"https://www.youtube.com/watch?v={ids[0]}"],
+                      playlist="PLdedupe0001")
+    assert resp.status_code == 202
+    assert [item["video_id"] for item in resp.get_json()["items"]] == ids
+    assert len(queued) == 4
+    assert sum(service.video_calls, []) == ids         # one lookup per unique video
+
+
+def test_batch_rejects_too_many_urls(service, queued):
+    ids = video_ids("many", app.BATCH_MAX_VIDEOS + 1)
+    resp = post_batch(youtube_urls=[f"https://youtu.be/{vid}" for vid in ids])
+    assert resp.status_code == 400
+    assert resp.get_json()["total"] == len(ids)
+    assert not service.video_calls and not queued
+
+
+def test_batch_rejects_oversized_playlist(service, queued):
+    service.playlist = video_ids("huge", 10 * app.DATA_API_BATCH)
+    resp = post_batch(playlist="PLoversized01")
+    assert resp.status_code == 400
+    assert resp.get_json()["total"] == len(service.playlist)
+    assert service.playlist_pages <= app.BATCH_MAX_VIDEOS // app.DATA_API_BATCH + 1
+    assert not service.video_calls and not queued
+
+
+def test_playlist_with_duplicates_fits_the_limit(service, queued):
+    ids = video_ids("dupe", app.BATCH_MAX_VIDEOS)
+    service.durations.update(dict.fromkeys(ids, "PT5M"))
+    service.playlist = ids + ids
+    resp = post_batch(playlist="PLduplicate01")
+    assert resp.status_code == 202
+    assert len(queued) == len(ids)
+
+
+def test_batch_rejects_videos_over_the_length_limit(service, queued):
+    short, long_ = video_ids("len", 2)
+    service.durations.update({short: "PT5M", long_: "PT2H"})
+    resp = post_batch(youtube_urls=[f"https://youtu.be/{short}", f"https://youtu.be/{long_}"])
+    assert resp.status_code == 202
+    items = {item["video_id"]: item for item in resp.get_json()["items"]}
+    assert "task_id" in items[short]
+    assert "too long" in items[long_]["error"] and "task_id" not in items[long_]
+    assert [job[2][0] for job in queued] == [f"https://www.youtube.com/watch?v={short}"]
+
+    resp = post_batch(youtube_urls=[f"https://youtu.be/{long_}"])
+    assert resp.status_code == 400
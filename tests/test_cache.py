@@ -0,0 +1,49 @@
+"""Result cache eviction never deletes a result that is being downloaded."""
+import json
+import os
+import time
+
+import pytest
+
+import app
+
+
+@pytest.fixture
+def downloads(tmp_path, monkeypatch):
+    monkeypatch.setattr(app, "DOWNLOADS_DIR", str(tmp_path))
+    return tmp_path
+
+
+def make_result(downloads, key, age):
+    """A finished result folder with one 1 MB chapter, last used `age` seconds ago."""
+    folder = downloads / key
+    folder.mkdir()
+    (folder / "Chapter.m4a").write_bytes(b"\0" * 1024 * 1024)
+    manifest = folder / app.RESULT_MANIFEST
+    manifest.write_text(json.dumps({"folder": key, "files": ["Chapter.m4a"]}))
+    os.utime(manifest, (time.time() - age, time.time() - age))
+    return manifest
+
+
+def test_evicts_only_results_not_read_recently(downloads):
+    make_result(downloads, "old", age=3600)
+    make_result(downloads, "recent", age=10)
+    app.cache_evict(max_mb=0)
+    assert sorted(os.listdir(downloads)) == ["recent"]
+
+
+@pytest.mark.parametrize("path", ["/download/stale/Chapter.m4a", "/download/stale"])
+def test_download_marks_result_in_use(downloads, path):
+    manifest = make_result(downloads, "stale", age=3600)
+    resp = app.app.test_client().get(path)
+    assert resp.status_code == 200
+    app.cache_evict(max_mb=0)
+    assert manifest.exists()
+
+
+def test_long_stream_keeps_touching(downloads, monkeypatch):
+    manifest = make_result(downloads, "streaming", age=3600)
+    monkeypatch.setattr(app, "RESULT_READ_GRACE", 0)
+    body = app.touching_result(iter([b"a", b"b"]), "streaming")
+    assert next(body) == b"a"
+    assert time.time() - manifest.stat().st_mtime < 60
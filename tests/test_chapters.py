@@ -0,0 +1,59 @@
+"""Chapter cutting with ffmpeg: output names, order and repeated titles."""
+import os
+import shutil
+import subprocess
+
+import pytest
+
+import app
+
+pytestmark = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="needs ffmpeg")
+
+REPEATED = "0:00 Intro\n0:04 Song\n0:08 Interlude\n0:12 Song\n0:16 Song"
+
+
+@pytest.fixture(scope="module")
+def audio(tmp_path_factory):
+    """20 s of tone as MP3 and as M4A."""
+    out = {}
+    for ext, codec in (("mp3", "libmp3lame"), ("m4a", "aac")):
+        path = str(tmp_path_factory.mktemp("src") / f"source.{ext}")
+        subprocess.run(["ffmpeg", "-y", "-hide_banner", "-loglevel", "error", "-f", "lavfi",
+                        "-i", "sine=frequency=220:duration=20", "-c:a", codec, path], check=True)
+        out[ext] = path
+    return out
+
+
+def chapters(description):
+    return app.add_end_times(app.parse_chapters(description), 20)
+
+
+def test_chapter_filenames_number_repeats():
+    assert app.chapter_filenames(chapters(REPEATED), "mp3") == [
+        "Intro.mp3", "Song.mp3", "Interlude.mp3", "Song (2).mp3", "Song (3).mp3"]
+
+
+def test_split_keeps_every_repeated_title(audio, tmp_path):
+    names = app.split_chapters(audio["m4a"], chapters(REPEATED), str(tmp_path), ext="m4a")
+    assert names == ["Intro.m4a", "Song.m4a", "Interlude.m4a", "Song (2).m4a", "Song (3).m4a"]
+    assert sorted(os.listdir(tmp_path)) == sorted(names)
+
+
+def test_split_out_of_order_description(audio, tmp_path):
+    names = app.split_chapters(audio["m4a"], chapters("0:10 B\n0:00 A"), str(tmp_path), ext="m4a")
+    assert names == ["A.m4a"]
+
+
+def test_encode_keeps_every_repeated_title(audio, tmp_path):
+    names = app.encode_chapters(audio["m4a"], chapters(REPEATED), str(tmp_path), workers=2)
+    assert names == ["Intro.mp3", "Song.mp3", "Interlude.mp3", "Song (2).mp3", "Song (3).mp3"]
+    assert sorted(os.listdir(tmp_path)) == sorted(names)
+
+
+def test_slice_keeps_every_repeated_title(audio, tmp_path):
+    src = str(tmp_path / "full_audio.mp3")
+    shutil.copy(audio["mp3"], src)
+    names, slices = app.slice_chapters(src, chapters(REPEATED), str(tmp_path))
+    assert names == ["Intro.mp3", "Song.mp3", "Interlude.mp3", "Song (2).mp3", "Song (3).mp3"]
+    assert [slices[n][0] < slices[n][1] for n in names] == [True] * 5
+    assert slices["Song.mp3"][1] <= slices["Interlude.mp3"][0] <= slices["Song (2).mp3"][0]
@@ -0,0 +1,85 @@
+"""CookieService waits: single flight, bounded, and never while holding its lock."""
+import threading
+import time
+
+import pytest
+
+import app
+
+
+class StubCookieService(app.CookieService):
+    """Browser thread stand-in: each queued request is handled by `behaviour`."""
+
+    def __init__(self, behaviour):
+        super().__init__(cookie_file="/dev/null")
+        self.behaviour = behaviour
+        self.served = 0
+
+    def _serve(self):
+        while True:
+            item = self._requests.get()
+            if item is None:
+                return
+            self.served += 1
+            self.behaviour(self, item)
+
+
+def refresh(service, item):
+    service._cookies, service._fetched_at = [], time.monotonic()
+    item[1].set()
+
+
+def hang(service, item):
+    threading.Event().wait()
+
+
+def crash(service, item):
+    raise RuntimeError("playwright missing")
+
+
+@pytest.fixture(autouse=True)
+def short_wait(monkeypatch):
+    monkeypatch.setattr(app, "COOKIE_REFRESH_WAIT", 0.3)
+
+
+def test_concurrent_callers_share_one_refresh():
+    service = StubCookieService(lambda s, item: (time.sleep(0.1), refresh(s, item)))
+    threads = [threading.Thread(target=service.ensure_fresh, args=("https://youtu.be/x",)) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(2)
+    assert service.served == 1 and service._is_fresh()
+
+
+def test_hung_refresh_times_out_without_cookies():
+    service = StubCookieService(hang)
+    t0 = time.monotonic()
+    with pytest.raises(TimeoutError):
+        service.ensure_fresh("https://youtu.be/x")
+    assert time.monotonic() - t0 < 2
+    assert not service._lock.locked()
+
+
+def test_hung_refresh_keeps_stale_cookies():
+    service = StubCookieService(hang)
+    service._cookies, service._fetched_at = [{"name": "old"}], time.monotonic() - 2 * service.ttl
+    callers = [threading.Thread(target=service.ensure_fresh, args=("https://youtu.be/x",)) for _ in range(3)]
+    t0 = time.monotonic()
+    for t in callers:
+        t.start()
+    for t in callers:
+        t.join(2)
+    assert time.monotonic() - t0 < 1                   # waited together, not one after another
+    assert service._cookies == [{"name": "old"}]
+
+
+def test_crashed_browser_thread_is_restarted():
+    service = StubCookieService(crash)
+    service._serve = lambda: crash(service, None)
+    with pytest.raises(RuntimeError):
+        service.ensure_fresh("https://youtu.be/x")
+    del service._serve                                 # back to the working stub
+    service.behaviour = refresh
+    service.ensure_fresh("https://youtu.be/x")
+    assert service._is_fresh()
@@ -0,0 +1,44 @@
+"""ranged_response: single ranges, unsatisfiable ranges and multi-range requests."""
+import pytest
+
+import app
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "source.bin"
+    path.write_bytes(bytes(range(256)) * 4)
+    return str(path)
+
+
+def get(source, **headers):
+    """The response to a GET for bytes 100-899 of `source`, as one 800-byte file."""
+    with app.app.test_request_context(headers=headers):
+        resp = app.ranged_response([(source, 100, 800)], 800, "abc", "audio/mpeg", "part.mp3")
+        resp.direct_passthrough = False
+        return resp.status_code, resp.headers, resp.get_data()
+
+
+def test_single_range(source):
+    status, headers, body = get(source, Range="bytes=10-19")
+    assert status == 206
+    assert headers["Content-Range"] == "bytes 10-19/800"
+    assert body == (bytes(range(256)) * 4)[110:120]
+
+
+def test_unsatisfiable_single_range(source):
+    status, headers, _ = get(source, Range="bytes=900-999")
+    assert status == 416
+    assert headers["Content-Range"] == "bytes */800"
+
+
+def test_multi_range_gets_whole_body(source):
+    status, headers, body = get(source, Range="bytes=0-9,20-29")
+    assert status == 200
+    assert "Content-Range" not in headers
+    assert body == (bytes(range(256)) * 4)[100:900]
+
+
+def test_stale_if_range_gets_whole_body(source):
+    status, _, body = get(source, Range="bytes=0-9", **{"If-Range": '"other"'})
+    assert status == 200 and len(body) == 800
@@ -0,0 +1,60 @@
+"""JobScheduler keeps each task's queue_position current."""
+import threading
+import time
+
+import pytest
+
+import app
+
+
+def test_queue_position_cleared_when_job_starts():
+    scheduler = app.JobScheduler(workers=1, max_queue=4)
+    release = threading.Event()
+    seen = {}
+
+    def job(task_id):
+        seen[task_id] = app.TASKS.get(task_id).get("queue_position")
+        release.wait(5)
+
+    for tid in ("sched-a", "sched-b", "sched-c"):
+        app.create_task(tid, status="queued", percent=0)
+    assert scheduler.submit_many([(tid, job, ()) for tid in ("sched-a", "sched-b", "sched-c")]) == [1, 2, 3]
+
+    while "sched-a" not in seen:
+        time.sleep(0.01)
+    assert seen["sched-a"] is None
+    assert app.TASKS.get("sched-b")["queue_position"] == 1
+    assert app.TASKS.get("sched-c")["queue_position"] == 2
+
+    release.set()
+    scheduler.shutdown(timeout=5)
+    assert seen == {"sched-a": None, "sched-b": None, "sched-c": None}
+    assert all(app.TASKS.get(tid)["queue_position"] is None for tid in seen)
+
+
+@pytest.mark.parametrize("store", ["memory", "sqlite"])
+def test_finished_jobs_have_no_queue_position(store, tmp_path, monkeypatch):
+    if store == "sqlite":
+        monkeypatch.setattr(app, "TASKS", app.SQLiteTaskStore(str(tmp_path / "tasks.sqlite3")))
+    scheduler = app.JobScheduler(workers=2, max_queue=300)
+    tids = [f"idle-{store}-{i}" for i in range(150)]
+    for tid in tids:
+        app.create_task(tid, status="queued", percent=0)
+    for tid in tids[:75]:
+        scheduler.submit(tid, lambda task_id: None)
+    scheduler.submit_many([(tid, lambda task_id: None, ()) for tid in tids[75:]])
+    scheduler.shutdown(timeout=30)
+    assert [tid for tid in tids if app.TASKS.get(tid).get("queue_position") is not None] == []
+
+
+def test_heartbeat_renews_running_claims(monkeypatch):
+    monkeypatch.setattr(app, "JOB_HEARTBEAT_SECS", 0.05)
+    scheduler = app.JobScheduler(workers=1, max_queue=4)
+    for tid in ("beat-a", "beat-b"):
+        app.create_task(tid, status="queued", percent=0)
+    app.TASKS.claim("beat:mp3", "beat-a", ttl=0.2)
+
+    scheduler.submit("beat-a", lambda task_id: time.sleep(0.6))
+    time.sleep(0.4)                                    # past the claim's own TTL
+    assert app.TASKS.claim("beat:mp3", "beat-b") == "beat-a"
+    scheduler.shutdown(timeout=5)
@@ -0,0 +1,17 @@
+"""
+Boot-time budget: benchmarks/startup.py's probe (fresh interpreters that
+import the app and serve GET /) must stay within its target.
+"""
+import os
+import sys
+
+from conftest import ROOT
+
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+import startup  # noqa: E402
+
+
+def test_boot_within_target():
+    report = startup.measure(runs=3)
+    assert report["within_target"], report
+    assert report["heavy_modules_loaded"] == []
@@ -0,0 +1,99 @@
+"""
+Job claims in both task stores: held while the owning worker heartbeats,
+free (with the orphaned task marked as an error) once it stops or dies.
+"""
+import socket
+import sqlite3
+import subprocess
+import sys
+import time
+
+import pytest
+
+import app
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return app.MemoryTaskStore()
+    return app.SQLiteTaskStore(str(tmp_path / "tasks.sqlite3"))
+
+
+def dead_pid():
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+
+def test_live_claim_is_joined(store):
+    store.create("first", {"status": "queued"})
+    store.create("second", {"status": "queued"})
+    assert store.claim("vid:mp3", "first") == "first"
+    assert store.claim("vid:mp3", "second") == "first"
+
+
+def test_finished_claim_is_free(store):
+    store.create("first", {"status": "done"})
+    store.create("second", {"status": "queued"})
+    store.claim("vid:mp3", "first")
+    assert store.claim("vid:mp3", "second") == "second"
+
+
+def test_silent_claim_is_taken_over(store):
+    store.create("first", {"status": "downloading", "queue_position": None})
+    store.create("second", {"status": "queued"})
+    store.claim("vid:mp3", "first", ttl=-1)           # heartbeat already overdue
+    assert store.claim("vid:mp3", "second") == "second"
+    assert store.get("first")["status"] == "error"
+    assert store.get("first")["error"] == app.ORPHANED_JOB_ERROR
+
+
+def test_heartbeat_keeps_claim(store):
+    store.create("first", {"status": "queued"})
+    store.create("second", {"status": "queued"})
+    store.claim("vid:mp3", "first", ttl=-1)
+    store.renew(["first"])
+    assert store.claim("vid:mp3", "second") == "first"
+
+
+def test_expire_marks_orphans(store):
+    store.create("first", {"status": "splitting"})
+    store.claim("vid:mp3", "first", ttl=-1)
+    store.expire()
+    assert store.get("first")["status"] == "error"
+    store.create("second", {"status": "queued"})
+    assert store.claim("vid:mp3", "second") == "second"
+
+
+def test_dead_owner_is_free(tmp_path):
+    store = app.SQLiteTaskStore(str(tmp_path / "tasks.sqlite3"))
+    store.create("first", {"status": "downloading"})
+    store.create("second", {"status": "queued"})
+    store.claim("vid:mp3", "first")
+    store._conn().execute("UPDATE claims SET owner = ?", (f"{socket.gethostname()}:{dead_pid()}",))
+    assert store.claim("vid:mp3", "second") == "second"
+    assert store.get("first")["status"] == "error"
+
+
+def test_other_hosts_live_on_heartbeat(tmp_path):
+    store = app.SQLiteTaskStore(str(tmp_path / "tasks.sqlite3"))
+    store.create("first", {"status": "downloading"})
+    store.create("second", {"status": "queued"})
+    store.claim("vid:mp3", "first")
+    store._conn().execute("UPDATE claims SET owner = 'elsewhere:1'")
+    assert store.claim("vid:mp3", "second") == "first"
+
+
+def test_old_claims_table_gains_owner(tmp_path):
+    path = str(tmp_path / "tasks.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.executescript("CREATE TABLE claims (key TEXT PRIMARY KEY, task_id TEXT NOT NULL, "
+                       "expires_at REAL NOT NULL);")
+    conn.execute("INSERT INTO claims VALUES ('vid:mp3', 'old', ?)", (time.time() + 60,))
+    conn.commit()
+    conn.close()
+    store = app.SQLiteTaskStore(path)
+    store.create("old", {"status": "queued"})
+    store.create("new", {"status": "queued"})
+    assert store.claim("vid:mp3", "new") == "old"     # unknown owner: trusted until it lapses